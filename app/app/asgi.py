@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# All requests share the event loop process, so bound the connections
+# with a pool rather than keeping one per worker thread.
+os.environ.setdefault('DB_POOL_MODE', 'pool')
 
 application = get_asgi_application()
@@ -10,8 +10,18 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 import os
+import sys
 from pathlib import Path
-from .secret_settings import SECRET_KEY
+
+# The key comes from DJANGO_SECRET_KEY or the untracked secret_settings.py;
+# test runs without either fall back to a fixed key unfit for anything else.
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    try:
+        from .secret_settings import SECRET_KEY
+    except ImportError:
+        if 'test' in sys.argv[1:2]:
+            SECRET_KEY = 'insecure-test-only-key'
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.performance.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,14 +85,30 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# DB_POOL_MODE selects how connections are reused:
+#   none       - open and close a connection per request
+#   persistent - keep one connection per worker thread for DB_CONN_MAX_AGE
+#                seconds, probed once per request (WSGI workers)
+#   pool       - borrow from a bounded in-process pool (ASGI, see asgi.py)
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backend',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER':os.environ.get('DB_USER'),
         'PASSWORD':os.environ.get('DB_PASS'),
-
+        'CONN_MAX_AGE': (
+            int(os.environ.get('DB_CONN_MAX_AGE', 600))
+            if DB_POOL_MODE == 'persistent' else 0
+        ),
+        'HEALTH_CHECKS': os.environ.get('DB_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        } if DB_POOL_MODE == 'pool' else None,
     }
 
 }
@@ -124,6 +151,138 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
+
+# How /media/ responses leave the process: 'python' streams them (using
+# the server's sendfile support when available), 'x-sendfile' and
+# 'x-accel-redirect' hand the file to the front proxy.
+MEDIA_SERVE = {
+    'MODE': os.environ.get('MEDIA_SERVE_MODE', 'python'),
+    'ACCEL_PREFIX': os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/'),
+}
+
+# Hash uploads while they stream in so images can be stored by content
+FILE_UPLOAD_HANDLERS = [
+    'core.uploadhandlers.HashingMemoryFileUploadHandler',
+    'core.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.User'
+
+# Uploaded recipe images are re-encoded and resized by a background
+# thread pool. Set MODE to 'sync' to process them inside the request.
+IMAGE_PROCESSING = {
+    'MODE': os.environ.get('IMAGE_PROCESSING_MODE', 'thread'),
+    'WORKERS': int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2)),
+    'QUALITY': 85,
+    'MAX_DIMENSION': 2048,
+    # Variants are served from disk and generated on first request; the
+    # eager ones are produced right after upload and never evicted.
+    'WEBP': True,
+    'EAGER_VARIANTS': ['thumbnail'],
+    'VARIANT_MAX_AGE_DAYS': 30,
+    'VARIANT_CACHE_BYTES': None,
+}
+
+# 'responses' caches per-user list responses. Local memory is only correct
+# for a single process; point RESPONSE_CACHE_BACKEND at the file based or
+# memcached backend (with RESPONSE_CACHE_LOCATION) when running several.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get(
+            'RESPONSE_CACHE_LOCATION', 'recipe-responses'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get('RESPONSE_CACHE_ENABLED', '1') == '1',
+    'ALIAS': 'responses',
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'user.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Tag and ingredient autocomplete indexes are cached per process and user
+AUTOCOMPLETE = {
+    'CACHE_SIZE': int(os.environ.get('AUTOCOMPLETE_CACHE_SIZE', 1000)),
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+}
+
+BULK_WRITES = {
+    'MAX_ITEMS': int(os.environ.get('BULK_WRITES_MAX_ITEMS', 1000)),
+    'BATCH_SIZE': 500,
+}
+
+# Build list responses from values() rows instead of serializers
+FAST_LIST = {
+    'ENABLED': os.environ.get('FAST_LIST_ENABLED', '0') == '1',
+}
+
+EXPORT = {
+    'CHUNK_SIZE': int(os.environ.get('EXPORT_CHUNK_SIZE', 2000)),
+}
+
+IMPORT = {
+    'BATCH_SIZE': int(os.environ.get('IMPORT_BATCH_SIZE', 5000)),
+}
+
+# Delta sync tokens only advance past change log entries of finished
+# transactions. On PostgreSQL that is checked against the running
+# transactions; other backends wait SETTLE_SECONDS, which must exceed the
+# longest write transaction.
+DELTA_SYNC = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 1000,
+    'SETTLE_SECONDS': int(os.environ.get('DELTA_SYNC_SETTLE_SECONDS', 5)),
+}
+
+# In-process LRU of authenticated tokens. Other processes only see a
+# token deletion or user change once their TTL expires, unless a shared
+# cache alias (e.g. memcached/redis in CACHES) is configured as well.
+TOKEN_AUTH_CACHE = {
+    'SIZE': int(os.environ.get('TOKEN_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_CACHE_TTL', 60)),
+    'SHARED_CACHE': os.environ.get('TOKEN_CACHE_ALIAS') or None,
+}
+
+# Query budgets views declare in performance_budgets are always enforced by
+# the tests (core.testing). Latency budgets depend on the machine, so they
+# are only checked when BUDGET_TIME_FACTOR scales them, e.g. in a perf job.
+PERFORMANCE_BUDGETS = {
+    'TIME_FACTOR': float(os.environ.get('BUDGET_TIME_FACTOR', 0)),
+}
+
+# Per-request Server-Timing headers, slow request logs and per-route
+# histograms (GET /api/performance/, staff only); see core.performance.
+PERFORMANCE = {
+    'ENABLED': os.environ.get('PERFORMANCE_ENABLED', '1') == '1',
+    # Staff always get Server-Timing; this sends it to every client
+    'SERVER_TIMING': os.environ.get('PERFORMANCE_SERVER_TIMING', '0') == '1',
+    'SLOW_MS': int(os.environ.get('PERFORMANCE_SLOW_MS', 500)),
+    'TOP_QUERIES': 5,
+}
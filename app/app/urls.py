@@ -14,14 +14,27 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import  static
+import re
+
+from django.urls import path, include, re_path
 from django.conf import settings
 
+from core import media
+from core.performance import PerformanceStatsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include("user.urls")),
-    path('api/recipe/',include('recipe.urls'))
+    path('api/recipe/', include('recipe.urls')),
+    path(
+        'api/performance/',
+        PerformanceStatsView.as_view(),
+        name='performance'
+    ),
+    re_path(
+        r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+        media.serve,
+        name='media'
+    ),
 
 ]
-urlpatterns += static(settings.MEDIA_URL,document_root =settings.MEDIA_ROOT)
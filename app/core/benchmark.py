@@ -0,0 +1,358 @@
+import hashlib
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.storage import content_addressed_name
+from recipe.bulk import get_or_create_by_name
+from recipe.hooks import objects_changed
+from recipe.images import encode
+from recipe.importer import RecipeImporter
+
+DOMAIN = 'benchmark.local'
+PASSWORD = 'benchmark'
+
+WORDS = (
+    'apple', 'basil', 'bean', 'beef', 'butter', 'carrot', 'cheese',
+    'chicken', 'chili', 'coconut', 'corn', 'cream', 'curry', 'egg',
+    'fennel', 'garlic', 'ginger', 'honey', 'kale', 'leek', 'lemon',
+    'lentil', 'lime', 'mango', 'mint', 'mushroom', 'noodle', 'oat',
+    'olive', 'onion', 'pasta', 'pea', 'pepper', 'pork', 'potato',
+    'rice', 'salmon', 'sesame', 'spinach', 'tomato', 'tofu', 'walnut',
+)
+DISHES = ('soup', 'stew', 'salad', 'curry', 'pie', 'bake', 'roast',
+          'risotto', 'stir fry', 'tart', 'sandwich', 'bowl')
+
+# Distinct images shared by the recipes given one
+IMAGE_POOL = 8
+
+
+def email(index):
+    """Return the email of the benchmark user with the given index"""
+    return f'user{index}@{DOMAIN}'
+
+
+def _zipf_sample(rng, names, count):
+    """Pick ``count`` distinct names, favouring those listed first"""
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    picked = set()
+    while len(picked) < min(count, len(names)):
+        picked.update(rng.choices(names, weights, k=count - len(picked)))
+    return sorted(picked)
+
+
+def _fan_out(rng, minimum, maximum):
+    """Return a heavy tailed link count between minimum and maximum"""
+    return min(maximum, minimum + int(rng.paretovariate(1.3)) - 1)
+
+
+def generate_records(rng, count, tag_names, ingredient_names):
+    """Yield recipe records in the import format with skewed relations"""
+    for number in range(1, count + 1):
+        title = f'{rng.choice(WORDS)} {rng.choice(WORDS)} ' \
+                f'{rng.choice(DISHES)}'.capitalize()
+        yield number, {
+            'title': title,
+            'time_minutes': rng.randint(5, 240),
+            'price': str(Decimal(rng.randint(100, 9999)) / 100),
+            'link': f'https://example.com/r/{number}'
+            if rng.random() < 0.5 else '',
+            'tags': _zipf_sample(rng, tag_names, _fan_out(rng, 1, 10)),
+            'ingredients': _zipf_sample(
+                rng, ingredient_names, _fan_out(rng, 3, 60)
+            ),
+        }
+
+
+def _image_names(rng):
+    """Store the shared pool of benchmark images, returning their names"""
+    storage = Recipe._meta.get_field('image').storage
+    names = []
+    for _ in range(IMAGE_POOL):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        content = encode(Image.new('RGB', (640, 480), color), 640)
+        name = content_addressed_name(
+            'uploads/recipe/',
+            hashlib.sha256(content).hexdigest(), 'jpg'
+        )
+        if not storage.exists(name):
+            storage.save(name, ContentFile(content))
+        names.append(name)
+    return names
+
+
+def seed(users=5, recipes=1000, tags=50, ingredients=300, images=0.0,
+         seed=0, batch_size=None, progress=None):
+    """Replace the benchmark users with a freshly generated dataset.
+
+    ``images`` is the fraction of recipes given a processed image.
+    Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    get_user_model().objects.filter(email__endswith=f'@{DOMAIN}').delete()
+    tag_names = [f'{word} {index}' for index, word in enumerate(
+        rng.choice(WORDS) for _ in range(tags)
+    )]
+    ingredient_names = [f'{word} {index}' for index, word in enumerate(
+        rng.choice(WORDS) for _ in range(ingredients)
+    )]
+    pool = _image_names(rng) if images else []
+    created = {'users': 0, 'tags': 0, 'ingredients': 0, 'recipes': 0,
+               'links': 0, 'images': 0}
+    for index in range(users):
+        user = get_user_model().objects.create_user(
+            email(index), PASSWORD, name=f'Benchmark user {index}'
+        )
+        Token.objects.create(user=user)
+        get_or_create_by_name(Tag, user, tag_names)
+        get_or_create_by_name(Ingredient, user, ingredient_names)
+        importer = RecipeImporter(user, batch_size)
+        importer.run(generate_records(
+            rng, recipes, tag_names, ingredient_names
+        ))
+        if pool:
+            created['images'] += _attach_images(rng, user, pool, images)
+        created['users'] += 1
+        created['tags'] += len(tag_names)
+        created['ingredients'] += len(ingredient_names)
+        created['recipes'] += importer.imported
+        created['links'] += importer.links
+        if progress:
+            progress(index + 1, users)
+    return created
+
+
+def _attach_images(rng, user, pool, fraction):
+    """Give a fraction of a user's recipes one of the pooled images"""
+    ids = list(Recipe.objects.filter(user=user).order_by('id').values_list(
+        'id', flat=True
+    ))
+    chosen = {}
+    for pk in ids:
+        if rng.random() < fraction:
+            chosen.setdefault(rng.choice(pool), []).append(pk)
+    now = timezone.now()
+    for name, pks in chosen.items():
+        Recipe.objects.filter(pk__in=pks).update(
+            image=name, image_status=Recipe.IMAGE_READY, updated_at=now
+        )
+    changed = [pk for pks in chosen.values() for pk in pks]
+    objects_changed(user.pk, Recipe, changed)
+    return len(changed)
+
+
+# A request replayed by the benchmark; ``path`` and ``data`` are
+# callables receiving the fixture built by ``_fixture``
+Scenario = namedtuple('Scenario', 'name method path data writes')
+
+
+def _scenario(name, method, path, data=None, writes=False):
+    return Scenario(name, method, path, data or (lambda f: None), writes)
+
+
+def _recipe_payload(fixture):
+    return {'title': 'Benchmark soup', 'time_minutes': 10, 'price': '4.50',
+            'tags': fixture['tags'][:3], 'ingredients': ['benchmark salt']}
+
+
+SCENARIOS = [
+    _scenario('recipe-list', 'get',
+              lambda f: reverse('recipe:recipe-list')),
+    _scenario('recipe-list-page', 'get',
+              lambda f: reverse('recipe:recipe-list') + '?page_size=50'),
+    _scenario('recipe-list-filter', 'get',
+              lambda f: reverse('recipe:recipe-list') +
+              f'?tags={f["tags"][0]}&page_size=50'),
+    _scenario('recipe-list-search', 'get',
+              lambda f: reverse('recipe:recipe-list') +
+              '?search=soup&page_size=50'),
+    _scenario('recipe-list-sparse', 'get',
+              lambda f: reverse('recipe:recipe-list') + '?fields=title'),
+    _scenario('recipe-list-expand', 'get',
+              lambda f: reverse('recipe:recipe-list') +
+              '?expand=tags,ingredients&page_size=50'),
+    _scenario('recipe-detail', 'get',
+              lambda f: reverse('recipe:recipe-detail',
+                                args=[f['recipe']])),
+    _scenario('recipe-create', 'post',
+              lambda f: reverse('recipe:recipe-list'),
+              _recipe_payload, writes=True),
+    _scenario('recipe-update', 'patch',
+              lambda f: reverse('recipe:recipe-detail', args=[f['recipe']]),
+              lambda f: {'title': 'Renamed', 'tags': f['tags'][1:4]},
+              writes=True),
+    _scenario('recipe-delete', 'delete',
+              lambda f: reverse('recipe:recipe-detail', args=[f['recipe']]),
+              writes=True),
+    _scenario('recipe-bulk-create', 'post',
+              lambda f: reverse('recipe:recipe-bulk'),
+              lambda f: [dict(_recipe_payload(f), tags=f['tags'][:3],
+                              ingredients=[], title=f'Bulk {i}')
+                         for i in range(50)],
+              writes=True),
+    _scenario('recipe-export', 'get',
+              lambda f: reverse('recipe:recipe-export')),
+    _scenario('tag-list', 'get', lambda f: reverse('recipe:tag-list')),
+    _scenario('tag-list-assigned', 'get',
+              lambda f: reverse('recipe:tag-list') + '?assigned_only=1'),
+    _scenario('tag-create', 'post', lambda f: reverse('recipe:tag-list'),
+              lambda f: {'name': 'Benchmark tag'}, writes=True),
+    _scenario('tag-autocomplete', 'get',
+              lambda f: reverse('recipe:tag-autocomplete') + '?q=on'),
+    _scenario('ingredient-list', 'get',
+              lambda f: reverse('recipe:ingredient-list')),
+    _scenario('ingredient-autocomplete', 'get',
+              lambda f: reverse('recipe:ingredient-autocomplete') + '?q=to'),
+    _scenario('changes', 'get', lambda f: reverse('recipe:changes')),
+    _scenario('image-variant', 'get', lambda f: f['image']),
+    _scenario('user-me', 'get', lambda f: reverse('user:me')),
+    _scenario('user-token', 'post', lambda f: reverse('user:token'),
+              lambda f: {'email': f['email'], 'password': PASSWORD}),
+    _scenario('user-create', 'post', lambda f: reverse('user:create'),
+              lambda f: {'email': f'new@{DOMAIN}', 'password': PASSWORD,
+                         'name': 'New'},
+              writes=True),
+]
+
+
+def _fixture(user):
+    """Collect the ids and names the scenarios refer to"""
+    image = Recipe.objects.filter(
+        user=user, image_status=Recipe.IMAGE_READY
+    ).values_list('image', flat=True).first()
+    return {
+        'email': user.email,
+        'recipe': Recipe.objects.filter(user=user).order_by(
+            'id'
+        ).values_list('id', flat=True).first(),
+        'tags': list(Tag.objects.filter(user=user).order_by(
+            'id'
+        ).values_list('id', flat=True)[:10]),
+        'image': image and reverse('recipe:image-variant', kwargs={
+            'name': image, 'variant': 'thumbnail', 'ext': 'jpg'
+        }),
+    }
+
+
+def percentile(samples, percent):
+    """Return the nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def _host():
+    """Return a host name the request validation accepts"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class Runner:
+    """Replay the scenarios for one benchmark user and collect stats"""
+
+    def __init__(self, user, iterations=50, warmup=5):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.fixture = _fixture(user)
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = APIClient(SERVER_NAME=_host())
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def _send(self, scenario):
+        """Send one request and read its whole body"""
+        path = scenario.path(self.fixture)
+        data = scenario.data(self.fixture)
+        send = getattr(self.client, scenario.method)
+        response = send(path, data, format='json') \
+            if data is not None else send(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def _request(self, scenario):
+        """Send one request, rolling back any writes it made"""
+        if not scenario.writes:
+            return self._send(scenario)
+        with transaction.atomic():
+            response = self._send(scenario)
+            transaction.set_rollback(True)
+        return response
+
+    def measure(self, scenario):
+        """Return the latency, query and allocation stats of a scenario"""
+        for _ in range(self.warmup):
+            self._request(scenario)
+        timings = []
+        for _ in range(self.iterations):
+            start = time.perf_counter()
+            response = self._request(scenario)
+            timings.append((time.perf_counter() - start) * 1000)
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+            self._request(scenario)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return {
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            # Transaction savepoints added by the runner are not counted
+            'queries': sum(1 for query in queries.captured_queries
+                           if 'SAVEPOINT' not in query['sql']),
+            'alloc_peak_kb': round(peak / 1024, 1),
+        }
+
+
+def run(user_email=None, iterations=50, warmup=5, names=None, cache=False):
+    """Benchmark every scenario (or those in ``names``), returning a report.
+
+    The response cache is disabled unless ``cache`` is set so list
+    timings measure the work of building responses.
+    """
+    user = get_user_model().objects.get(email=user_email or email(0))
+    runner = Runner(user, iterations, warmup)
+    results = {}
+    overrides = {} if cache else {'RESPONSE_CACHE': dict(
+        getattr(settings, 'RESPONSE_CACHE', {}), ENABLED=False
+    )}
+    with override_settings(**overrides):
+        for scenario in SCENARIOS:
+            if names and scenario.name not in names:
+                continue
+            if scenario.name == 'image-variant' and \
+                    not runner.fixture['image']:
+                continue
+            results[scenario.name] = runner.measure(scenario)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'user': user.email,
+            'recipes': Recipe.objects.filter(user=user).count(),
+            'iterations': iterations,
+            'response_cache': cache,
+        },
+        'results': results,
+    }
@@ -0,0 +1,100 @@
+"""PostgreSQL backend adding connection health checks and pooling.
+
+Configured through two extra keys of the ``DATABASES`` entry:
+
+* ``HEALTH_CHECKS``: probe a persistent connection once per request, the
+  first time it is used, and reconnect if the server dropped it.
+* ``POOL``: when set, connections are borrowed from a bounded in-process
+  :class:`~core.db.pool.ConnectionPool` instead of being opened per
+  request. ``CONN_MAX_AGE`` should be 0 so each request hands its
+  connection back when it finishes.
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from core.db.pool import ConnectionPool, PoolTimeout, get_pool
+
+Database = base.Database
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'HEALTH_CHECKS', False
+        )
+        self.health_check_done = False
+        self.pool = None
+
+    def get_pool(self, conn_params):
+        """Return the process wide pool for this alias, if pooling"""
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        connect = partial(super().get_new_connection, conn_params)
+        return get_pool(self.alias, lambda: ConnectionPool(
+            connect,
+            max_size=options.get('MAX_SIZE', 10),
+            timeout=options.get('TIMEOUT', 5.0),
+            max_idle=options.get('MAX_IDLE', 300.0),
+            check=self._check_pooled,
+            check_after=options.get('CHECK_AFTER', 30.0),
+        ))
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as e:
+            raise Database.OperationalError(str(e)) from e
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    @staticmethod
+    def _check_pooled(connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        connection.rollback()
+        return True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        connection = self.connection
+        broken = connection.closed or (
+            self.errors_occurred and not self.is_usable()
+        )
+        if not broken:
+            try:
+                connection.rollback()
+            except Database.Error:
+                broken = True
+        pool.release(connection, discard=broken)
+
+    def close_if_unusable_or_obsolete(self):
+        # Runs at the start and end of every request.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.health_check_enabled
+            and not self.health_check_done
+            and self.connection is not None
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the wait timeout"""
+
+
+class ConnectionPool:
+    """Thread safe bounded pool of DB-API connections.
+
+    At most ``max_size`` connections are open at any time. ``acquire`` hands
+    out an idle connection (most recently used first, so surplus ones age
+    out), opens a new one while below the bound, or waits up to ``timeout``
+    seconds for one to be released. Connections idle for longer than
+    ``max_idle`` are closed, and ones idle for longer than ``check_after``
+    are probed with ``check`` before being handed out.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=5.0, max_idle=300.0,
+                 check=None, check_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._check = check
+        self.check_after = check_after
+        self._idle = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'connections_created': 0,
+            'connections_reused': 0,
+            'connections_discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def acquire(self):
+        """Return a connection, opening or waiting for one as needed"""
+        deadline = None
+        waited_since = None
+        while True:
+            with self._cond:
+                conn, idle_for = self._pop_idle()
+                if conn is None and self._open < self.max_size:
+                    self._open += 1
+                    break
+                if conn is None:
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + self.timeout
+                        waited_since = now
+                        self._stats['waits'] += 1
+                    if now >= deadline or not self._cond.wait(deadline - now):
+                        if not self._idle and self._open >= self.max_size:
+                            self._stats['timeouts'] += 1
+                            self._record_wait(waited_since)
+                            raise PoolTimeout(
+                                f'No connection available within '
+                                f'{self.timeout}s ({self.max_size} in use)'
+                            )
+                    continue
+            if self._usable(conn, idle_for):
+                with self._cond:
+                    self._stats['connections_reused'] += 1
+                    self._record_wait(waited_since)
+                return conn
+            self._discard(conn)
+
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats['connections_created'] += 1
+            self._record_wait(waited_since)
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it when discard is set"""
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def metrics(self):
+        """Return a snapshot of the pool size and wait statistics"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'open': self._open,
+                'idle': len(self._idle),
+                'in_use': self._open - len(self._idle),
+                **self._stats,
+            }
+
+    def _pop_idle(self):
+        """Pop the freshest idle connection, closing expired ones"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._open -= 1
+            self._stats['connections_discarded'] += 1
+            self._close(conn)
+        if not self._idle:
+            return None, 0
+        conn, released_at = self._idle.pop()
+        return conn, now - released_at
+
+    def _usable(self, conn, idle_for):
+        """Probe a connection that sat idle for a while"""
+        if self._check is None or idle_for < self.check_after:
+            return True
+        try:
+            return self._check(conn)
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot"""
+        self._close(conn)
+        with self._cond:
+            self._open -= 1
+            self._stats['connections_discarded'] += 1
+            self._cond.notify()
+
+    def _record_wait(self, waited_since):
+        """Account for the time spent waiting; the lock must be held"""
+        if waited_since is None:
+            return
+        waited = time.monotonic() - waited_since
+        self._stats['wait_seconds_total'] += waited
+        self._stats['wait_seconds_max'] = max(
+            self._stats['wait_seconds_max'], waited
+        )
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, factory):
+    """Return the pool for a database alias, creating it with factory"""
+    with _pools_lock:
+        if alias not in _pools:
+            _pools[alias] = factory()
+        return _pools[alias]
+
+
+def pool_metrics():
+    """Return the metrics of every pool in this process keyed by alias"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.metrics() for alias, pool in pools.items()}
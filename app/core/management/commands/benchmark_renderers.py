@@ -0,0 +1,76 @@
+import timeit
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+def recipe_payload(count):
+    """Return a recipe list shaped like the API's list response"""
+    base = 'http://testserver/media/uploads/recipe/ab/abcdef0123456789'
+    return [
+        {
+            'id': i,
+            'title': f'Roasted vegetable soup no. {i}',
+            'ingredients': list(range(i, i + 12)),
+            'tags': list(range(i, i + 4)),
+            'time_minutes': 45,
+            'price': f'{i % 50}.95',
+            'link': f'https://example.com/recipes/{i}',
+            'image_status': 'ready',
+            'images': {
+                'original': f'{base}.jpg',
+                'thumbnail': f'{base}_thumbnail.jpg',
+                'medium': f'{base}_medium.jpg',
+                'large': f'{base}_large.jpg',
+                'webp': {
+                    'thumbnail': f'{base}_thumbnail.webp',
+                    'medium': f'{base}_medium.webp',
+                    'large': f'{base}_large.webp',
+                },
+            },
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    """Compare the renderers and parsers on a realistic recipe list"""
+    help = 'Time rendering and parsing of a recipe list in each format'
+
+    formats = (
+        ('json (DRF)', JSONRenderer, JSONParser),
+        ('orjson', ORJSONRenderer, ORJSONParser),
+        ('msgpack', MessagePackRenderer, MessagePackParser),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100)
+        parser.add_argument('--number', type=int, default=200)
+
+    def _time(self, func, number):
+        """Return the best time of one call in microseconds"""
+        return min(timeit.repeat(func, number=number, repeat=3)) \
+            / number * 1e6
+
+    def handle(self, *args, **options):
+        payload = recipe_payload(options['recipes'])
+        number = options['number']
+        self.stdout.write(
+            f'{options["recipes"]} recipes, best of 3 x {number} runs'
+        )
+        self.stdout.write(
+            f'{"format":<12}{"bytes":>10}{"render us":>12}{"parse us":>12}'
+        )
+        for name, renderer_class, parser_class in self.formats:
+            renderer, parser = renderer_class(), parser_class()
+            body = renderer.render(payload)
+            render = self._time(lambda: renderer.render(payload), number)
+            parse = self._time(lambda: parser.parse(BytesIO(body)), number)
+            self.stdout.write(
+                f'{name:<12}{len(body):>10}{render:>12.1f}{parse:>12.1f}'
+            )
@@ -0,0 +1,67 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Time every API route in-process against the benchmark dataset"""
+    help = ('Report latency percentiles, queries and allocations per '
+            'endpoint; run seed_benchmark first')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email', help='User to benchmark as, the first seeded one '
+                            'by default'
+        )
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--only', nargs='+', metavar='SCENARIO',
+            choices=[scenario.name for scenario in benchmark.SCENARIOS],
+            help='Scenarios to run, all by default'
+        )
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Keep the list response cache enabled'
+        )
+        parser.add_argument(
+            '--output', help='Write the JSON report to this file'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the JSON report instead of a table'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmark.run(
+                user_email=options['email'],
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                names=options['only'],
+                cache=options['cache'],
+            )
+        except get_user_model().DoesNotExist:
+            raise CommandError(
+                'Benchmark user not found, run seed_benchmark first'
+            )
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(text + '\n')
+        if options['json']:
+            self.stdout.write(text)
+            return
+        self.stdout.write(
+            f'{"scenario":<26}{"status":>7}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"p99 ms":>10}{"queries":>9}{"alloc kb":>10}'
+        )
+        for name, stats in report['results'].items():
+            self.stdout.write(
+                f'{name:<26}{stats["status"]:>7}{stats["p50_ms"]:>10.2f}'
+                f'{stats["p95_ms"]:>10.2f}{stats["p99_ms"]:>10.2f}'
+                f'{stats["queries"]:>9}{stats["alloc_peak_kb"]:>10.1f}'
+            )
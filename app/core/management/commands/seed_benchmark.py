@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Generate the deterministic benchmark dataset"""
+    help = 'Replace the benchmark users with a generated dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument(
+            '--recipes', type=int, default=1000, help='Recipes per user'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=50, help='Tags per user'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=300,
+            help='Ingredients per user'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Fraction of recipes given a processed image'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Random seed of the dataset'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, help='Recipes inserted per batch'
+        )
+
+    def handle(self, *args, **options):
+        created = benchmark.seed(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            images=options['images'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            progress=self._progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(', '.join(
+            f'{count} {name}' for name, count in created.items()
+        ))
+        self.stdout.write(
+            f'Benchmark users are {benchmark.email(0)} and up, '
+            f'password "{benchmark.PASSWORD}"'
+        )
+
+    def _progress(self, done, total):
+        """Report each seeded user"""
+        self.stdout.write(f'Seeded user {done}/{total}')
@@ -0,0 +1,176 @@
+"""Media file serving with conditional GET, ranges and proxy offload.
+
+``MEDIA_SERVE['MODE']`` selects how the bytes leave the process:
+
+* ``python``: stream from a :class:`~django.http.FileResponse`. WSGI
+  servers that provide ``wsgi.file_wrapper`` (gunicorn, uwsgi) hand the
+  file descriptor to ``os.sendfile``, so the copy stays in the kernel.
+* ``x-sendfile``: return headers only, with ``X-Sendfile`` pointing at the
+  file (Apache mod_xsendfile, lighttpd).
+* ``x-accel-redirect``: return headers only, with ``X-Accel-Redirect`` to
+  ``MEDIA_SERVE['ACCEL_PREFIX']`` + path (nginx ``internal`` location).
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+# Content addressed names embed the SHA-256 of the file
+CONTENT_ADDRESSED_RE = re.compile(
+    r'(^|/)(?P<digest>[0-9a-f]{64})(?P<suffix>_[a-z]+)?\.[a-z0-9]+$'
+)
+
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+DEFAULTS = {
+    'MODE': 'python',
+    'ACCEL_PREFIX': '/protected-media/',
+}
+
+
+def get_option(name):
+    """Return a MEDIA_SERVE option, falling back to the default"""
+    return getattr(settings, 'MEDIA_SERVE', {}).get(name, DEFAULTS[name])
+
+
+class RangeFile:
+    """Read-only view of ``length`` bytes of a file starting at ``start``.
+
+    Exposes ``fileno`` so a server ``wsgi.file_wrapper`` can still
+    ``sendfile`` the slice (it starts at the current offset and stops at
+    Content-Length), while plain iteration never reads past the range.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def make_etag(name, stat):
+    """Return a strong ETag, the content hash when the name carries one"""
+    match = CONTENT_ADDRESSED_RE.search(name)
+    if match:
+        return '"%s%s"' % (match.group('digest'), match.group('suffix') or '')
+    return '"%x-%x"' % (stat.st_size, stat.st_mtime_ns)
+
+
+def parse_range(request, size, etag, mtime):
+    """Return the ``(start, end)`` byte range requested, or None.
+
+    Only single ranges are honoured; multiple ranges, or an ``If-Range``
+    validator that no longer matches, get the full representation as
+    allowed by RFC 7233. Raises ValueError when the range is unsatisfiable.
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_RE.match(header)
+    if not match:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag:
+        since = parse_http_date_safe(if_range)
+        if since is None or int(mtime) > since:
+            return None
+
+    start, end = match.group('start'), match.group('end')
+    if not start:
+        if not end or int(end) == 0:
+            raise ValueError('Unsatisfiable range')
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError('Unsatisfiable range')
+    return start, end
+
+
+def serve_file(request, fullpath, name):
+    """Serve a file from disk honouring validators and Range requests"""
+    try:
+        stat = os.stat(fullpath)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('"%s" does not exist' % name)
+    etag = make_etag(name, stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is not None:
+        return _add_validators(response, name, etag, stat)
+
+    size = stat.st_size
+    try:
+        byte_range = parse_range(request, size, etag, stat.st_mtime)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */%d' % size
+        return response
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    mode = get_option('MODE')
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+    elif mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = get_option('ACCEL_PREFIX') + name
+    elif byte_range is None:
+        response = FileResponse(
+            open(fullpath, 'rb'), content_type=content_type
+        )
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(open(fullpath, 'rb'), start, length),
+            content_type=content_type,
+            status=206
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return _add_validators(response, name, etag, stat)
+
+
+def _add_validators(response, name, etag, stat):
+    """Attach caching headers shared by full, partial and 304 responses"""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if CONTENT_ADDRESSED_RE.search(name):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def serve(request, path, document_root=None):
+    """Serve a file below ``document_root`` (MEDIA_ROOT by default)"""
+    name = posixpath.normpath(path).lstrip('/')
+    fullpath = safe_join(document_root or settings.MEDIA_ROOT, name)
+    if os.path.isdir(fullpath):
+        raise Http404('Directory indexes are not allowed here.')
+    return serve_file(request, fullpath, name)
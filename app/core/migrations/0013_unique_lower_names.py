@@ -0,0 +1,60 @@
+"""Make tag and ingredient names unique per user regardless of case.
+
+Objects whose names only differ in case are merged into the oldest one
+first. Reversing the migration only drops the unique indexes: the merged
+duplicates are gone and are not recreated.
+"""
+from django.db import migrations
+from django.db.models import Count, Min
+from django.db.models.functions import Lower
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold objects of a user whose names only differ in case into one"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'),
+                                 ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(relation).remote_field.through
+        target = f'{model_name.lower()}_id'
+        # Group with the database's lower(), as the unique index does
+        groups = model.objects.values(
+            'user_id', lower_name=Lower('name')
+        ).annotate(original=Min('id'), count=Count('id')).filter(count__gt=1)
+        for group in groups:
+            original = group['original']
+            duplicates = list(model.objects.annotate(
+                lower_name=Lower('name')
+            ).filter(
+                user_id=group['user_id'], lower_name=group['lower_name']
+            ).exclude(pk=original).values_list('id', flat=True))
+            linked = through.objects.filter(
+                **{target: original}
+            ).values('recipe_id')
+            for duplicate in duplicates:
+                through.objects.filter(**{target: duplicate}).exclude(
+                    recipe_id__in=linked
+                ).update(**{target: original})
+            model.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        # Merged objects cannot be split again, see the module docstring
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_tag_user_lower_name_uniq '
+            'ON core_tag (user_id, lower(name));',
+            'DROP INDEX core_tag_user_lower_name_uniq;',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_ingredient_user_lower_name_uniq '
+            'ON core_ingredient (user_id, lower(name));',
+            'DROP INDEX core_ingredient_user_lower_name_uniq;',
+        ),
+    ]
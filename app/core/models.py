@@ -1,18 +1,27 @@
-import os
-import uuid
-from django.db import models
+from django.db import connections, models
 from django.contrib.auth.models import AbstractBaseUser,BaseUserManager,\
                                 PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    SearchVector, SearchVectorField
+from django.utils import timezone
 # Create your models here.
 
 
-def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image"""
+from .storage import ContentAddressedStorage, content_addressed_name, \
+    content_hash
+
+
+def recipe_image_name(file, filename):
+    """Return the content addressed storage name of an uploaded image"""
     ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    return content_addressed_name('uploads/recipe/', content_hash(file), ext)
 
-    return os.path.join('uploads/recipe/', filename)
+
+def recipe_image_file_path(instance, filename):
+    """Generate the content addressed file path for a new recipe image"""
+    return recipe_image_name(instance.image.file, filename)
 
 
 
@@ -52,6 +61,14 @@ class Tag(models.Model):
                              on_delete=models.CASCADE,
 
                              )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -63,11 +80,157 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+
     def __str__(self):
         return self.name
 
+
+# Text search configuration used for the recipe search vector
+SEARCH_CONFIG = 'english'
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Queryset helpers loading the minimal data each recipe view needs"""
+
+    LIST_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'image',
+                   'image_status', 'tags', 'ingredients')
+    RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+
+    def _prefetch(self, relation, named=False):
+        """Prefetch the ids, and with ``named`` the names, of a relation"""
+        columns = ('id', 'name') if named else ('id',)
+        return models.Prefetch(relation, queryset=self.RELATIONS[
+            relation
+        ].objects.only(*columns).order_by('id'))
+
+    def for_list(self, fields=None, expand=()):
+        """Scalar columns plus the related ids rendered by the list view.
+
+        ``fields`` narrows the model fields loaded, skipping the prefetch
+        of relations not listed; relations in ``expand`` are prefetched
+        with their names for nested rendering.
+        """
+        fields = self.LIST_FIELDS if fields is None else ('id', *fields)
+        return self.only(
+            *(name for name in fields if name not in self.RELATIONS)
+        ).prefetch_related(*(
+            self._prefetch(relation, relation in expand)
+            for relation in self.RELATIONS if relation in fields
+        ))
+
+    def for_detail(self, fields=None):
+        """Recipe with the nested tag and ingredient objects prefetched"""
+        if fields is not None:
+            return self.for_list(fields, expand=tuple(self.RELATIONS))
+        return self.defer('search_vector').prefetch_related(*(
+            self._prefetch(relation, named=True)
+            for relation in self.RELATIONS
+        ))
+
+    def filter_related(self, relation, ids, match_all=False):
+        """Filter recipes linked to any (or all) of the given related ids.
+
+        Works directly on the M2M through table so the lookup is served by
+        its ``(<target>_id, recipe_id)`` index and needs no DISTINCT.
+        """
+        field = self.model._meta.get_field(relation)
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        ids = set(ids)
+        links = field.remote_field.through.objects.filter(
+            **{f'{target}_id__in': ids}
+        )
+        if match_all:
+            links = links.values(source).annotate(
+                matched=models.Count(target)
+            ).filter(matched=len(ids))
+        return self.filter(id__in=links.values(source))
+
+    def for_image(self):
+        """Only the columns needed to attach an image to a recipe"""
+        return self.only('id', 'user', 'image', 'image_status')
+
+    def _search_indexed(self):
+        return connections[self.db].vendor == 'postgresql'
+
+    def search(self, text):
+        """Filter by title, tag and ingredient names, annotating the rank.
+
+        PostgreSQL matches web search syntax against the GIN indexed
+        ``search_vector``. Other databases fall back to requiring every word
+        in one of the names, ranking title matches first.
+        """
+        if self._search_indexed():
+            query = SearchQuery(
+                text, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return self.filter(search_vector=query).annotate(
+                search_rank=SearchRank(models.F('search_vector'), query)
+            )
+
+        words = text.split()
+        matches = Recipe.objects.all()
+        for word in words:
+            matches = matches.filter(
+                models.Q(title__icontains=word) |
+                models.Q(id__in=Recipe.tags.through.objects.filter(
+                    tag__name__icontains=word
+                ).values('recipe_id')) |
+                models.Q(id__in=Recipe.ingredients.through.objects.filter(
+                    ingredient__name__icontains=word
+                ).values('recipe_id'))
+            )
+        in_title = models.Q()
+        for word in words:
+            in_title &= models.Q(title__icontains=word)
+        return self.filter(id__in=matches.values('id')).annotate(
+            search_rank=models.Case(
+                models.When(in_title, then=models.Value(1.0)),
+                default=models.Value(0.5),
+                output_field=models.FloatField()
+            )
+        )
+
+    def update_search_vector(self):
+        """Recompute ``search_vector`` of the recipes in this queryset"""
+        if not self._search_indexed():
+            return 0
+
+        def names(model):
+            return models.Subquery(
+                model.objects.filter(recipe=models.OuterRef('pk'))
+                .values('recipe')
+                .annotate(names=StringAgg('name', ' '))
+                .values('names')
+            )
+
+        return self.update(search_vector=(
+            SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+            SearchVector(names(Tag), weight='B', config=SEARCH_CONFIG) +
+            SearchVector(names(Ingredient), weight='C', config=SEARCH_CONFIG)
+        ))
+
+
 class Recipe(models.Model):
     """Recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -76,7 +239,58 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255,blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True,upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+        db_index=True
+    )
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.signals; GIN indexed on PostgreSQL only
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+
     def __str__(self):
         return self.title
 
+
+class Change(models.Model):
+    """Log entry of a created, updated or deleted user owned object.
+
+    Each object keeps only its latest entry, so a user's log grows with
+    the number of objects rather than the number of edits. The user link
+    has no database constraint: deletion signals still append entries
+    while a user is being deleted, and they are purged once it is gone.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    # PostgreSQL id of the writing transaction, 0 on other backends
+    txid = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'txid', 'id']),
+            models.Index(fields=['user', 'model', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
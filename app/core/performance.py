@@ -0,0 +1,325 @@
+"""Per-request timing: Server-Timing headers, slow request logs, histograms.
+
+:class:`PerformanceMiddleware` measures every request it wraps:
+
+* ``db``: time and number of queries, from a ``connection.execute_wrapper``
+  installed on every database connection for the request.
+* ``serialize``: time spent building serializer ``data``, including any
+  queries that triggers.
+* ``render``: time spent rendering the response body.
+* ``total``: time spent in the rest of the middleware chain and the view.
+
+The figures are sent in a ``Server-Timing`` header to staff users, or to
+everyone when ``PERFORMANCE['SERVER_TIMING']`` is on (meant for local
+development: the header reveals query counts and internal timings to
+anonymous clients). Requests slower than
+``PERFORMANCE['SLOW_MS']`` are logged with their slowest queries, and every
+request is added to a histogram of its route name (``recipe:recipe-list``)
+and method, served to staff users by :class:`PerformanceStatsView`
+along with the metrics of the process's database connection pools.
+Histograms are kept per process. The body of a streaming response is
+produced after the middleware returns, so its queries are not counted.
+With ``PERFORMANCE['ENABLED']`` off the middleware removes itself from the
+chain and nothing is instrumented.
+
+Serializers are timed by wrapping DRF's ``BaseSerializer.data`` getter,
+which every serializer's ``data`` goes through. The wrapper is installed
+when an enabled middleware is created and removed again when the
+setting is turned off; outside a measured request it only reads a
+context variable.
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+from core.db.pool import pool_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'SLOW_MS': 500,
+    'TOP_QUERIES': 5,
+}
+
+# Upper bounds in ms of the request time histogram buckets
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+UNRESOLVED_ROUTE = '<unresolved>'
+
+_current = ContextVar('performance_timings', default=None)
+
+# DRF's own getter, restored by ``uninstrument_serializers``
+_serializer_data = BaseSerializer.data
+
+
+def get_option(name):
+    """Return a PERFORMANCE option, falling back to the default"""
+    return getattr(settings, 'PERFORMANCE', {}).get(name, DEFAULTS[name])
+
+
+class Timings:
+    """Measurements of one request, in seconds"""
+    __slots__ = ('queries', 'db', 'serialize', 'render', 'render_start',
+                 'serializing', 'slowest', 'top')
+
+    def __init__(self, top):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = self.render = None
+        self.render_start = None
+        self.serializing = False
+        # Min-heap of the ``top`` slowest (seconds, sql) pairs
+        self.slowest = []
+        self.top = top
+
+    def execute(self, execute, sql, params, many, context):
+        """``execute_wrapper`` timing each query of the request"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db += elapsed
+            if len(self.slowest) < self.top:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif self.top and elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+    def add_serialize(self, elapsed):
+        self.serialize = (self.serialize or 0.0) + elapsed
+
+
+def _timed_data(fget):
+    """Wrap the ``data`` getter of serializers to time it per request"""
+    def data(serializer):
+        timings = _current.get()
+        # Nested serializers render through their parent's getter
+        if timings is None or timings.serializing:
+            return fget(serializer)
+        timings.serializing = True
+        start = time.perf_counter()
+        try:
+            return fget(serializer)
+        finally:
+            timings.add_serialize(time.perf_counter() - start)
+            timings.serializing = False
+    return data
+
+
+def instrument_serializers():
+    """Time serializer ``data`` while a request is being measured"""
+    if BaseSerializer.data is _serializer_data:
+        BaseSerializer.data = property(_timed_data(_serializer_data.fget))
+
+
+def uninstrument_serializers():
+    """Restore DRF's serializer ``data`` getter"""
+    BaseSerializer.data = _serializer_data
+
+
+@receiver(setting_changed)
+def performance_setting_changed(setting, **kwargs):
+    """Remove the serializer timing once the middleware is disabled"""
+    if setting == 'PERFORMANCE' and not get_option('ENABLED'):
+        uninstrument_serializers()
+
+
+class Histogram:
+    """Request times of one route, bucketed by ``BUCKETS``"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = self.db = self.serialize = self.render = 0.0
+        self.queries = 0
+        self.max = 0.0
+
+    def add(self, total, timings):
+        self.counts[bisect_left(BUCKETS, total)] += 1
+        self.count += 1
+        self.total += total
+        self.max = max(self.max, total)
+        self.db += timings.db * 1000
+        self.queries += timings.queries
+        self.serialize += (timings.serialize or 0.0) * 1000
+        self.render += (timings.render or 0.0) * 1000
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding a percentile"""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return round(self.max, 1)
+
+    def as_dict(self):
+        count = self.count or 1
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / count, 1),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max, 1),
+            'db_ms': round(self.db / count, 1),
+            'queries': round(self.queries / count, 1),
+            'serialize_ms': round(self.serialize / count, 1),
+            'render_ms': round(self.render / count, 1),
+            'buckets': dict(zip(
+                [str(bound) for bound in BUCKETS] + ['+Inf'], self.counts
+            )),
+        }
+
+
+class RouteStats:
+    """Histograms of the requests served by this process, per route"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def add(self, route, total, timings):
+        with self.lock:
+            histogram = self.histograms.get(route)
+            if histogram is None:
+                histogram = self.histograms[route] = Histogram()
+            histogram.add(total, timings)
+
+    def snapshot(self):
+        """Return the histograms as a dict keyed by route"""
+        with self.lock:
+            return {route: histogram.as_dict()
+                    for route, histogram in sorted(self.histograms.items())}
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+
+route_stats = RouteStats()
+
+
+def server_timing(timings, total):
+    """Return the ``Server-Timing`` header value of a request"""
+    metrics = [
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries"'
+    ]
+    if timings.serialize is not None:
+        metrics.append(f'serialize;dur={timings.serialize * 1000:.1f}')
+    if timings.render is not None:
+        metrics.append(f'render;dur={timings.render * 1000:.1f}')
+    metrics.append(f'total;dur={total:.1f}')
+    return ', '.join(metrics)
+
+
+def route_name(request):
+    """Return the method and URL name a request was routed to"""
+    match = getattr(request, 'resolver_match', None)
+    name = match.view_name if match else UNRESOLVED_ROUTE
+    return f'{request.method} {name}'
+
+
+class PerformanceMiddleware:
+    """Measure database, serializer and render time of each request"""
+
+    def __init__(self, get_response):
+        if not get_option('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.server_timing = get_option('SERVER_TIMING')
+        self.slow_ms = get_option('SLOW_MS')
+        self.top_queries = get_option('TOP_QUERIES')
+        instrument_serializers()
+
+    def __call__(self, request):
+        timings = Timings(self.top_queries)
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = (time.perf_counter() - start) * 1000
+
+        route = route_name(request)
+        route_stats.add(route, total, timings)
+        if self.server_timing or self.is_staff(request):
+            response['Server-Timing'] = server_timing(timings, total)
+        if self.slow_ms is not None and total >= self.slow_ms:
+            self.log_slow(request, route, total, timings)
+        return response
+
+    @staticmethod
+    def is_staff(request):
+        """Return whether the user the view authenticated is staff"""
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_staff)
+
+    def process_template_response(self, request, response):
+        """Start the render clock; the handler renders right after this"""
+        timings = _current.get()
+        if timings is not None:
+            timings.render_start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: self._rendered(timings)
+            )
+        return response
+
+    def _rendered(self, timings):
+        timings.render = time.perf_counter() - timings.render_start
+
+    def log_slow(self, request, route, total, timings):
+        queries = ''.join(
+            f'\n  {elapsed * 1000:.1f} ms: {sql}'
+            for elapsed, sql in sorted(timings.slowest, reverse=True)
+        )
+        logger.warning(
+            'Slow request %s (%s) took %.0f ms, %d queries in %.0f ms%s',
+            request.get_full_path(), route, total, timings.queries,
+            timings.db * 1000, queries
+        )
+
+
+class PerformanceStatsView(APIView):
+    """Return the request time histograms and pool metrics of this process"""
+    permission_classes = (IsAdminUser,)
+    performance_budgets = {
+        'get': {'queries': 0, 'ms': 100},
+        'delete': {'queries': 0, 'ms': 100},
+    }
+
+    def get(self, request):
+        return Response({
+            'buckets_ms': list(BUCKETS),
+            'routes': route_stats.snapshot(),
+            'pools': pool_metrics(),
+        })
+
+    def delete(self, request):
+        route_stats.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
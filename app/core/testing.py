@@ -0,0 +1,116 @@
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+
+DEFAULTS = {
+    'TIME_FACTOR': 0,
+}
+
+
+def get_option(name):
+    """Return a PERFORMANCE_BUDGETS option, falling back to the default"""
+    return getattr(settings, 'PERFORMANCE_BUDGETS', {}).get(
+        name, DEFAULTS[name]
+    )
+
+
+def get_budget(method, url):
+    """Return the budget the view routed at ``url`` declares for a call.
+
+    Viewsets key ``performance_budgets`` by action, plain API views by
+    lowercase HTTP method.
+    """
+    view = resolve(urlsplit(url).path).func
+    view_class = getattr(view, 'cls', None) or view.view_class
+    actions = getattr(view, 'actions', None)
+    name = actions.get(method, method) if actions else method
+    budgets = getattr(view_class, 'performance_budgets', {})
+    if name not in budgets:
+        raise AssertionError(
+            f'{view_class.__name__} declares no performance budget '
+            f'for {name!r}'
+        )
+    return budgets[name]
+
+
+class BudgetTestMixin:
+    """Hold API calls to the performance budgets their views declare.
+
+    A budget is ``{'queries': n, 'ms': t}``; either key may be left out.
+    Query budgets must hold at any data size, which
+    ``assertBudgetAtSizes`` checks by repeating a call after growing the
+    data and requiring the query count to stay the same. Time budgets are
+    opt-in: they are scaled by ``PERFORMANCE_BUDGETS['TIME_FACTOR']``,
+    which defaults to 0 (off) so wall-clock noise cannot fail a normal run.
+    """
+
+    def measure(self, method, url, **kwargs):
+        """Run a request, returning the response, its queries and its ms"""
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        return response, len(ctx.captured_queries), elapsed
+
+    def count_queries(self, method, url, **kwargs):
+        """Run a request and return the response with its query count"""
+        response, queries, _ = self.measure(method, url, **kwargs)
+        return response, queries
+
+    def assertWithinBudget(self, method, url, **kwargs):
+        """Run a request and check it against its view's budget"""
+        budget = get_budget(method, url)
+        response, queries, elapsed = self.measure(method, url, **kwargs)
+        call = f'{method.upper()} {url}'
+        self.assertLess(
+            response.status_code, 400,
+            f'{call} failed with {response.status_code}'
+        )
+        if 'queries' in budget:
+            self.assertLessEqual(
+                queries, budget['queries'],
+                f'{call} ran {queries} queries, budget {budget["queries"]}'
+            )
+        factor = get_option('TIME_FACTOR')
+        if 'ms' in budget and factor:
+            self.assertLessEqual(
+                elapsed, budget['ms'] * factor,
+                f'{call} took {elapsed:.1f} ms, budget {budget["ms"]} ms'
+            )
+        return response, queries
+
+    def assertConstantQueries(self, populate, request, sizes=(1, 25)):
+        """Populate the database at each size and compare query counts"""
+        counts = []
+        for size in sizes:
+            populate(size)
+            response, count = request()
+            self.assertLess(response.status_code, 300)
+            counts.append(count)
+        self.assertEqual(
+            len(set(counts)), 1,
+            f'Query count grows with result size: {dict(zip(sizes, counts))}'
+        )
+        return counts[0]
+
+    def assertBudgetAtSizes(self, populate, method, url, sizes=(1, 25),
+                            **kwargs):
+        """Check a call stays in budget with flat queries as data grows.
+
+        ``url`` and the request ``data`` may be callables, evaluated after
+        each ``populate`` so they can refer to the rows just created.
+        """
+        def request():
+            options = dict(kwargs)
+            if callable(options.get('data')):
+                options['data'] = options['data']()
+            return self.assertWithinBudget(
+                method, url() if callable(url) else url, **options
+            )
+        return self.assertConstantQueries(populate, request, sizes)
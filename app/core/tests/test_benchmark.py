@@ -0,0 +1,87 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core import benchmark
+from core.models import Recipe
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BenchmarkTests(TestCase):
+    """Test the benchmark dataset and runner"""
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed generates the same libraries"""
+        def titles():
+            return list(Recipe.objects.order_by('id').values_list(
+                'user__email', 'title', 'price'
+            ))
+
+        created = benchmark.seed(users=2, recipes=20, tags=8,
+                                 ingredients=30, seed=3)
+        first = titles()
+        benchmark.seed(users=2, recipes=20, tags=8, ingredients=30, seed=3)
+
+        self.assertEqual(titles(), first)
+        self.assertEqual(created['recipes'], 40)
+        self.assertEqual(Recipe.objects.count(), 40)
+
+    def test_fan_out_is_skewed(self):
+        """Test a few popular tags carry most of the links"""
+        benchmark.seed(users=1, recipes=200, tags=20, ingredients=50)
+        recipe = Recipe.objects.first()
+        counts = sorted(
+            (tag.recipe_set.count()
+             for tag in recipe.user.tag_set.all()),
+            reverse=True
+        )
+
+        self.assertGreater(counts[0], 4 * counts[-1] + 1)
+
+    def test_images(self):
+        """Test a fraction of recipes gets a processed image"""
+        created = benchmark.seed(users=1, recipes=20, tags=5,
+                                 ingredients=10, images=0.5)
+
+        self.assertGreater(created['images'], 0)
+        self.assertEqual(
+            Recipe.objects.filter(image_status=Recipe.IMAGE_READY).count(),
+            created['images']
+        )
+
+    def test_run_reports_every_scenario(self):
+        """Test the runner replays each scenario and leaves no writes"""
+        benchmark.seed(users=1, recipes=10, tags=5, ingredients=10,
+                       images=0.5)
+        report = benchmark.run(iterations=2, warmup=0)
+
+        self.assertEqual(set(report['results']),
+                         {scenario.name for scenario in benchmark.SCENARIOS})
+        for name, stats in report['results'].items():
+            self.assertLess(stats['status'], 400, name)
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_commands(self):
+        """Test the commands seed, run and write the JSON report"""
+        out = StringIO()
+        call_command('seed_benchmark', users=1, recipes=5, tags=3,
+                     ingredients=5, stdout=out)
+        self.assertIn('5 recipes', out.getvalue())
+
+        path = os.path.join(tempfile.mkdtemp(), 'report.json')
+        call_command('run_benchmark', iterations=1, warmup=0,
+                     only=['recipe-list', 'user-me'], output=path,
+                     stdout=out)
+        with open(path) as report:
+            self.assertEqual(
+                set(json.load(report)['results']), {'recipe-list', 'user-me'}
+            )
+        with self.assertRaises(CommandError):
+            call_command('run_benchmark', email='nobody@test.com',
+                         stdout=out)
@@ -0,0 +1,126 @@
+import os
+import tempfile
+
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+from core.media import RangeFile
+
+CONTENT = b'0123456789' * 10
+
+
+class MediaServingTests(TestCase):
+    """Test the media view's conditional and range handling"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.root.name, 'uploads'))
+        self.path = os.path.join(self.root.name, 'uploads', 'file.txt')
+        with open(self.path, 'wb') as f:
+            f.write(CONTENT)
+        self.override = override_settings(MEDIA_ROOT=self.root.name)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.root.cleanup()
+
+    def get(self, **headers):
+        """Request the test file"""
+        return self.client.get('/media/uploads/file.txt', **headers)
+
+    def test_full_response(self):
+        """Test a plain GET returns the file with validators"""
+        response = self.get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_if_none_match(self):
+        """Test a matching ETag returns 304"""
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        """Test an unmodified file returns 304"""
+        mtime = os.stat(self.path).st_mtime
+        response = self.get(HTTP_IF_MODIFIED_SINCE=http_date(mtime + 1))
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        """Test a byte range returns only that slice"""
+        response = self.get(HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            response['Content-Range'], f'bytes 10-19/{len(CONTENT)}'
+        )
+
+    def test_suffix_range(self):
+        """Test a suffix range returns the end of the file"""
+        response = self.get(HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[-5:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range past the end returns 416"""
+        response = self.get(HTTP_RANGE=f'bytes={len(CONTENT)}-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_returns_full_file(self):
+        """Test a non matching If-Range ignores the range"""
+        response = self.get(HTTP_RANGE='bytes=0-4', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_file(self):
+        """Test unknown files return 404"""
+        response = self.client.get('/media/uploads/missing.txt')
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_SERVE={'MODE': 'x-accel-redirect',
+                                    'ACCEL_PREFIX': '/internal/'})
+    def test_accel_redirect_offload(self):
+        """Test nginx offload returns headers only"""
+        response = self.get()
+
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/internal/uploads/file.txt'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SERVE={'MODE': 'x-sendfile'})
+    def test_sendfile_offload(self):
+        """Test X-Sendfile offload points at the file on disk"""
+        response = self.get()
+
+        self.assertEqual(response['X-Sendfile'], self.path)
+        self.assertEqual(response.content, b'')
+
+
+class RangeFileTests(TestCase):
+    """Test the bounded file wrapper used for ranges"""
+
+    def test_reads_stop_at_range_end(self):
+        """Test reading never returns bytes past the range"""
+        with tempfile.TemporaryFile() as f:
+            f.write(CONTENT)
+            wrapped = RangeFile(f, 5, 7)
+
+            self.assertEqual(wrapped.read(4), CONTENT[5:9])
+            self.assertEqual(wrapped.read(100), CONTENT[9:12])
+            self.assertEqual(wrapped.read(), b'')
+            self.assertEqual(wrapped.fileno(), f.fileno())
@@ -0,0 +1,162 @@
+import re
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+
+from core import performance
+from core.db import pool
+from core.models import Recipe, Tag
+from core.performance import PerformanceMiddleware, route_stats
+
+RECIPE_URL = reverse('recipe:recipe-list')
+PERFORMANCE_URL = reverse('performance')
+
+TIMING_RE = re.compile(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) queries")?')
+
+
+def parse_server_timing(header):
+    """Return the metrics of a Server-Timing header by name"""
+    return {name: (float(dur), queries and int(queries))
+            for name, dur, queries in TIMING_RE.findall(header)}
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Test the per-request performance instrumentation"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'perf@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        route_stats.clear()
+        self.addCleanup(route_stats.clear)
+
+    @override_settings(PERFORMANCE={'SERVER_TIMING': True})
+    def test_server_timing_header(self):
+        """Test database, serializer, render and total times are sent"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(RECIPE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        metrics = parse_server_timing(response['Server-Timing'])
+        self.assertEqual(
+            set(metrics), {'db', 'serialize', 'render', 'total'}
+        )
+        self.assertEqual(metrics['db'][1], len(ctx.captured_queries))
+        self.assertLessEqual(metrics['db'][0], metrics['total'][0])
+
+    @override_settings(PERFORMANCE={'SLOW_MS': 0, 'TOP_QUERIES': 2})
+    def test_slow_request_logged(self):
+        """Test slow requests are logged with their slowest queries"""
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get(RECIPE_URL)
+
+        message = logs.output[0]
+        self.assertIn('GET recipe:recipe-list', message)
+        self.assertEqual(message.count(' ms: SELECT'), 2)
+
+    def test_fast_request_not_logged(self):
+        """Test requests under the threshold are not logged"""
+        with mock.patch.object(performance.logger, 'warning') as warning:
+            self.client.get(RECIPE_URL)
+
+        warning.assert_not_called()
+
+    def test_histograms_per_route(self):
+        """Test staff see request histograms grouped by route name"""
+        self.client.get(RECIPE_URL)
+        self.client.get(RECIPE_URL)
+        self.client.get(reverse('user:me'))
+        staff = get_user_model().objects.create_user(
+            'staff@test.com', 'testpass', is_staff=True
+        )
+        self.client.force_authenticate(staff)
+        response = self.client.get(PERFORMANCE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = response.data['routes']
+        recipes = routes['GET recipe:recipe-list']
+        self.assertEqual(recipes['count'], 2)
+        self.assertEqual(sum(recipes['buckets'].values()), 2)
+        self.assertGreater(recipes['queries'], 0)
+        self.assertEqual(routes['GET user:me']['count'], 1)
+
+        self.client.delete(PERFORMANCE_URL)
+        # Only the reset itself is recorded afterwards
+        self.assertEqual(list(route_stats.snapshot()), ['DELETE performance'])
+
+    def test_pool_metrics(self):
+        """Test staff see the metrics of the connection pools"""
+        connection_pool = pool.ConnectionPool(mock.Mock, max_size=3)
+        connection_pool.release(connection_pool.acquire())
+        staff = get_user_model().objects.create_user(
+            'staff@test.com', 'testpass', is_staff=True
+        )
+        self.client.force_authenticate(staff)
+        with mock.patch.dict(pool._pools, {'default': connection_pool}):
+            response = self.client.get(PERFORMANCE_URL)
+
+        metrics = response.data['pools']['default']
+        self.assertEqual(metrics['max_size'], 3)
+        self.assertEqual(metrics['idle'], 1)
+        self.assertEqual(metrics['connections_created'], 1)
+
+    def test_histograms_staff_only(self):
+        """Test other users cannot read the histograms"""
+        response = self.client.get(PERFORMANCE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_server_timing_staff_only(self):
+        """Test by default only staff users receive the header"""
+        response = self.client.get(RECIPE_URL)
+        anonymous = APIClient().get(RECIPE_URL)
+        self.user.is_staff = True
+        staff = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(anonymous.status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('Server-Timing', anonymous)
+        self.assertIn('db;dur=', staff['Server-Timing'])
+        self.assertEqual(
+            route_stats.snapshot()['GET recipe:recipe-list']['count'], 3
+        )
+
+    @override_settings(PERFORMANCE={'ENABLED': False})
+    def test_disabled(self):
+        """Test the middleware leaves the chain when disabled"""
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: HttpResponse())
+
+        self.assertIs(BaseSerializer.data, performance._serializer_data)
+        self.user.is_staff = True
+        response = self.client.get(RECIPE_URL)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_serializer_instrumentation_reversible(self):
+        """Test the serializer timing installs once and can be removed"""
+        PerformanceMiddleware(lambda request: HttpResponse())
+        timed = BaseSerializer.data
+        PerformanceMiddleware(lambda request: HttpResponse())
+
+        self.assertIsNot(timed, performance._serializer_data)
+        self.assertIs(BaseSerializer.data, timed)
+        performance.uninstrument_serializers()
+        self.addCleanup(performance.instrument_serializers)
+        self.assertIs(BaseSerializer.data, performance._serializer_data)
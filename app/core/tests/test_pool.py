@@ -0,0 +1,94 @@
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stand-in DB-API connection recording whether it was closed"""
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test the bounded connection pool"""
+
+    def test_connections_reused(self):
+        """Test a released connection is handed out again"""
+        pool = ConnectionPool(FakeConnection, max_size=2)
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        metrics = pool.metrics()
+        self.assertEqual(metrics['connections_created'], 1)
+        self.assertEqual(metrics['connections_reused'], 1)
+
+    def test_bounded_size_times_out(self):
+        """Test acquiring beyond max_size waits and then fails"""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.01)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(pool.metrics()['timeouts'], 1)
+        self.assertEqual(pool.metrics()['open'], 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread receives a connection when one frees up"""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=5)
+        conn = pool.acquire()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(pool.acquire()))
+        waiter.start()
+        pool.release(conn)
+        waiter.join(5)
+
+        self.assertEqual(result, [conn])
+        self.assertEqual(pool.metrics()['waits'], 1)
+
+    def test_discarded_connection_frees_slot(self):
+        """Test discarding closes the connection and allows a new one"""
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.01)
+        conn = pool.acquire()
+        pool.release(conn, discard=True)
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_failed_health_check_replaces_connection(self):
+        """Test an idle connection failing its probe is replaced"""
+        pool = ConnectionPool(
+            FakeConnection, max_size=1, check=lambda conn: False,
+            check_after=0
+        )
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn.closed)
+
+    def test_idle_connections_expire(self):
+        """Test connections idle beyond max_idle are closed"""
+        pool = ConnectionPool(FakeConnection, max_size=2, max_idle=10)
+        with patch('core.db.pool.time.monotonic', return_value=100):
+            conn = pool.acquire()
+            pool.release(conn)
+        with patch('core.db.pool.time.monotonic', return_value=200):
+            self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn.closed)
+
+    def test_connect_failure_frees_slot(self):
+        """Test a failed connect does not leak pool capacity"""
+        pool = ConnectionPool(
+            lambda: (_ for _ in ()).throw(OSError('down')), max_size=1
+        )
+        with self.assertRaises(OSError):
+            pool.acquire()
+        self.assertEqual(pool.metrics()['open'], 0)
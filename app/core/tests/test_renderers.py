@@ -0,0 +1,113 @@
+import datetime
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class RendererTests(TestCase):
+    """Test the orjson and MessagePack renderers and parsers"""
+
+    def setUp(self):
+        self.data = {
+            'price': Decimal('4.50'),
+            'created': datetime.datetime(
+                2020, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc
+            ),
+            'day': datetime.date(2020, 1, 2),
+            'uuid': uuid.UUID('12345678123456781234567812345678'),
+            'lazy': gettext_lazy('Soup'),
+            'text': 'Crème brûlée  ',
+            'nested': [{'id': 1, 'tags': (1, 2)}],
+        }
+
+    def test_json_matches_drf(self):
+        """Test orjson output is byte for byte DRF's"""
+        self.assertEqual(
+            ORJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data)
+        )
+
+    def test_json_indent_falls_back(self):
+        """Test indented output is still produced when asked for"""
+        rendered = ORJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=4'
+        )
+
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+    def test_msgpack_round_trip(self):
+        """Test MessagePack encodes decimals and datetimes like JSON"""
+        body = MessagePackRenderer().render(self.data)
+        parsed = MessagePackParser().parse(BytesIO(body))
+
+        self.assertEqual(parsed['price'], 4.5)
+        self.assertEqual(parsed['created'], '2020-01-02T03:04:05.678901Z')
+        self.assertEqual(parsed['nested'], [{'id': 1, 'tags': [1, 2]}])
+
+    def test_parse_errors(self):
+        """Test malformed bodies raise a parse error"""
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a":'))
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(BytesIO(b'\xc1'))
+
+
+class ContentNegotiationTests(TestCase):
+    """Test clients can speak MessagePack to the API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'msgpack@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_msgpack_requests_and_responses(self):
+        """Test a recipe can be created and listed in MessagePack"""
+        body = msgpack.packb({
+            'title': 'Soup', 'time_minutes': 5, 'price': '4.50',
+            'tags': [], 'ingredients': [],
+        })
+        response = self.client.post(
+            RECIPE_URL, body, content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            msgpack.unpackb(response.content)['title'], 'Soup'
+        )
+        self.assertTrue(Recipe.objects.filter(title='Soup').exists())
+
+    def test_json_is_the_default(self):
+        """Test JSON is served when no format is requested"""
+        response = self.client.get(RECIPE_URL)
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_benchmark_command(self):
+        """Test the renderer benchmark reports every format"""
+        out = StringIO()
+        call_command('benchmark_renderers', recipes=2, number=1, stdout=out)
+
+        for name in ('json (DRF)', 'orjson', 'msgpack'):
+            self.assertIn(name, out.getvalue())
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core import media
+from core.models import Recipe
+from core.storage import ContentAddressedStorage, content_addressed_name
+from recipe import images
+from recipe.images import delete_image_files
+
+
+def jpeg_bytes(color='red'):
+    """Return the bytes of a small JPEG image"""
+    buffer = BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test the content addressed storage backend"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.root.name)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_same_name_written_once(self):
+        """Test saving existing content keeps the name and the file"""
+        data = b'content'
+        name = content_addressed_name(
+            'uploads/', hashlib.sha256(data).hexdigest(), 'txt'
+        )
+
+        first = self.storage.save(name, ContentFile(data))
+        second = self.storage.save(name, ContentFile(data))
+
+        self.assertEqual(first, name)
+        self.assertEqual(second, name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.storage.path(name))),
+            [os.path.basename(name)]
+        )
+
+
+@override_settings(IMAGE_PROCESSING={'MODE': 'sync'})
+class RecipeImageDeduplicationTests(TransactionTestCase):
+    """Test identical uploads share one reference counted file"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'dedupe@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5, price=5
+            )
+            for i in range(2)
+        ]
+
+    def _upload(self, recipe, data):
+        """Upload raw bytes as the image of a recipe"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(data)
+            ntf.seek(0)
+            self.client.post(
+                reverse('recipe:recipe-upload-image', args=[recipe.id]),
+                {'image': ntf},
+                format='multipart'
+            )
+        recipe.refresh_from_db()
+        return recipe.image
+
+    @override_settings(IMAGE_PROCESSING={'MODE': 'thread'})
+    def test_upload_named_by_content_hash(self):
+        """Test the upload name is the SHA-256 streamed from the request"""
+        data = jpeg_bytes()
+        with patch('recipe.tasks.enqueue_image'):
+            image = self._upload(self.recipes[0], data)
+
+        self.assertIn(hashlib.sha256(data).hexdigest(), image.name)
+        image.storage.delete(image.name)
+
+    def test_shared_file_deleted_with_last_reference(self):
+        """Test a shared image survives until its last recipe is deleted"""
+        data = jpeg_bytes('blue')
+        first = self._upload(self.recipes[0], data)
+        second = self._upload(self.recipes[1], data)
+        self.assertEqual(first.name, second.name)
+        path = first.path
+
+        self.recipes[0].delete()
+        self.assertTrue(os.path.exists(path))
+        self.recipes[1].delete()
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_image_released(self):
+        """Test replacing an image removes the unreferenced old file"""
+        old = self._upload(self.recipes[0], jpeg_bytes('green'))
+        old_path = old.path
+        self._upload(self.recipes[0], jpeg_bytes('yellow'))
+
+        self.assertFalse(os.path.exists(old_path))
+        self.recipes[0].delete()
+
+    def test_release_waits_for_concurrent_reuse(self):
+        """Test a release cannot delete a file an upload is reusing"""
+        data = jpeg_bytes('purple')
+        name = content_addressed_name(
+            'uploads/recipe/', hashlib.sha256(data).hexdigest(), 'jpg'
+        )
+        storage = Recipe._meta.get_field('image').storage
+        storage.save(name, ContentFile(data))
+        self.addCleanup(delete_image_files, storage, name)
+        delete = images.delete_image_files
+        reused = threading.Event()
+
+        def upload():
+            """Reuse the stored file and reference it, as an upload does"""
+            with images.image_lock(name):
+                storage.save(name, ContentFile(data))
+                Recipe.objects.filter(pk=self.recipes[0].pk).update(
+                    image=name
+                )
+            reused.set()
+
+        def delete_during_upload(*args):
+            """Start the upload between the reference check and delete"""
+            thread = threading.Thread(target=upload)
+            thread.start()
+            self.assertFalse(reused.wait(0.2))
+            delete(*args)
+            self.addCleanup(thread.join)
+
+        with patch('recipe.images.delete_image_files', delete_during_upload):
+            images.release_image(storage, name)
+        self.assertTrue(reused.wait(5))
+
+        self.recipes[0].refresh_from_db()
+        self.assertEqual(self.recipes[0].image.name, name)
+        self.assertTrue(storage.exists(name))
+
+
+class MediaServeTests(TestCase):
+    """Test media responses for content addressed files"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def _write(self, name):
+        path = os.path.join(self.root.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'data')
+
+    def test_hashed_names_immutable(self):
+        """Test hashed files are served with an immutable cache header"""
+        name = content_addressed_name('uploads/recipe/', 'a' * 64, 'jpg')
+        self._write(name)
+        response = media.serve(
+            self.factory.get('/media/'), name, document_root=self.root.name
+        )
+
+        self.assertEqual(
+            response['Cache-Control'], media.IMMUTABLE_CACHE_CONTROL
+        )
+
+    def test_other_names_not_immutable(self):
+        """Test files without a content hash keep default caching"""
+        self._write('uploads/recipe/photo.jpg')
+        response = media.serve(
+            self.factory.get('/media/'), 'uploads/recipe/photo.jpg',
+            document_root=self.root.name
+        )
+
+        self.assertFalse(response.has_header('Cache-Control'))
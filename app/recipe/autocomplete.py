@@ -0,0 +1,152 @@
+import difflib
+import heapq
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+
+from .cache import get_generation
+
+DEFAULTS = {
+    'CACHE_SIZE': 1000,
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'FUZZY_MIN_LENGTH': 3,
+    'FUZZY_CUTOFF': 0.75,
+    'FUZZY_CANDIDATES': 50,
+}
+
+# Leading characters of each key indexed by trigram for fuzzy lookups
+FUZZY_CHARS = 16
+
+
+def get_option(name):
+    """Return an AUTOCOMPLETE option, falling back to the default"""
+    return getattr(settings, 'AUTOCOMPLETE', {}).get(name, DEFAULTS[name])
+
+
+def normalize(text):
+    """Lowercase and collapse whitespace"""
+    return ' '.join(text.lower().split())
+
+
+def trigrams(text):
+    """Return the trigrams of the start of a text, padded on the left"""
+    text = '  ' + text[:FUZZY_CHARS]
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PrefixIndex:
+    """Sorted prefix index over the names of one user's tags or ingredients.
+
+    Every word suffix of a name is a key (``red onion`` and ``onion``), so
+    a prefix matches the start of any word. Lookups are two bisections
+    over the sorted keys; matches are ranked by how many recipes use them.
+    Prefixes without a match fall back to fuzzy matching against the few
+    keys sharing the most trigrams with them.
+    """
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        keys = []
+        for ref, (_, name, _) in enumerate(self.rows):
+            words = normalize(name).split()
+            for start in range(len(words)):
+                keys.append((' '.join(words[start:]), ref))
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.refs = [ref for _, ref in keys]
+        self._trigrams = None
+
+    def search(self, prefix, limit):
+        """Return up to ``limit`` rows matching a prefix, most used first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        refs = set(self.refs[start:end])
+        if not refs and len(prefix) >= get_option('FUZZY_MIN_LENGTH'):
+            refs = self._fuzzy(prefix)
+        return [
+            self.rows[ref] for ref in heapq.nsmallest(
+                limit, refs,
+                key=lambda ref: (-self.rows[ref][2],
+                                 normalize(self.rows[ref][1]),
+                                 self.rows[ref][0])
+            )
+        ]
+
+    def trigram_postings(self):
+        """Return the key positions of each trigram, built on first use"""
+        if self._trigrams is None:
+            postings = {}
+            for position, key in enumerate(self.keys):
+                for trigram in trigrams(key):
+                    postings.setdefault(trigram, []).append(position)
+            self._trigrams = postings
+        return self._trigrams
+
+    def fuzzy_candidates(self, prefix):
+        """Return the positions of the keys sharing most trigrams"""
+        postings = self.trigram_postings()
+        shared = Counter()
+        for trigram in trigrams(prefix):
+            shared.update(postings.get(trigram, ()))
+        return [position for position, _ in
+                shared.most_common(get_option('FUZZY_CANDIDATES'))]
+
+    def _fuzzy(self, prefix):
+        """Return the rows whose word starts resemble a mistyped prefix"""
+        cutoff = get_option('FUZZY_CUTOFF')
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(prefix)
+        refs = set()
+        for position in self.fuzzy_candidates(prefix):
+            matcher.set_seq1(self.keys[position][:len(prefix)])
+            if matcher.real_quick_ratio() >= cutoff and \
+                    matcher.quick_ratio() >= cutoff and \
+                    matcher.ratio() >= cutoff:
+                refs.add(self.refs[position])
+        return refs
+
+    def __len__(self):
+        return len(self.rows)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def build_index(queryset):
+    """Index the names of a queryset with their recipe usage counts"""
+    return PrefixIndex(
+        queryset.order_by().annotate(
+            uses=Count('recipe')
+        ).values_list('id', 'name', 'uses')
+    )
+
+
+def get_index(queryset, user_id):
+    """Return the cached index of a user's objects, rebuilding when stale.
+
+    Indexes are held per process and tagged with the user's cache
+    generation, so any change to the user's recipe data replaces them.
+    """
+    key = (queryset.model._meta.label, user_id)
+    generation = get_generation(user_id)
+    with _indexes_lock:
+        entry = _indexes.get(key)
+        if entry is not None and entry[0] == generation:
+            _indexes.move_to_end(key)
+            return entry[1]
+
+    index = build_index(queryset.filter(user_id=user_id))
+    with _indexes_lock:
+        _indexes[key] = (generation, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > get_option('CACHE_SIZE'):
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,298 @@
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .hooks import objects_changed
+
+DEFAULTS = {
+    'MAX_ITEMS': 1000,
+    'BATCH_SIZE': 500,
+}
+
+
+def get_option(name):
+    """Return a BULK_WRITES option, falling back to the default"""
+    return getattr(settings, 'BULK_WRITES', {}).get(name, DEFAULTS[name])
+
+
+def insert_objects(model, objs):
+    """Insert objects in batches, setting their primary keys.
+
+    Backends that cannot return ids from a multi-row INSERT (SQLite on
+    this Django version) fall back to one INSERT per object.
+    """
+    connection = connections[model.objects.db]
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(
+            objs, batch_size=get_option('BATCH_SIZE')
+        )
+    for obj in objs:
+        obj.save(force_insert=True)
+    return objs
+
+
+def get_or_create_by_name(model, user, names, retry=True):
+    """Return the ids of a user's objects named ``names``, creating them.
+
+    Missing names are inserted with one statement. The ``(user,
+    lower(name))`` unique index turns a concurrent insert of the same name
+    into an IntegrityError, after which the names are looked up again.
+    Returns a map of lowercased names to ids.
+    """
+    if not names:
+        return {}
+    try:
+        with transaction.atomic():
+            objs = insert_objects(
+                model, [model(user=user, name=name) for name in names]
+            )
+    except IntegrityError:
+        if not retry:
+            raise
+        lowered = {name.lower(): name for name in names}
+        existing = dict(model.objects.filter(user=user).annotate(
+            lower_name=Lower('name')
+        ).filter(lower_name__in=lowered).values_list('lower_name', 'pk'))
+        missing = [name for lower_name, name in lowered.items()
+                   if lower_name not in existing]
+        return {**existing, **get_or_create_by_name(
+            model, user, missing, retry=False
+        )}
+    objects_changed(user.pk, model, [obj.pk for obj in objs])
+    return {obj.name.lower(): obj.pk for obj in objs}
+
+
+def set_relations(model, relation, wanted, new=False):
+    """Make each object link exactly the given ids, writing only the diff.
+
+    ``wanted`` maps object ids to sets of related ids. The current links
+    of all objects are read in one query (skipped for ``new`` objects),
+    then stale links are removed with one DELETE and missing ones added
+    with one multi-row INSERT. Returns the ids of the objects whose links
+    changed.
+    """
+    field = model._meta.get_field(relation)
+    through = field.remote_field.through
+    source = field.m2m_field_name() + '_id'
+    target = field.m2m_reverse_field_name() + '_id'
+
+    current = {}
+    if not new:
+        links = through.objects.filter(
+            **{f'{source}__in': list(wanted)}
+        ).values_list('pk', source, target)
+        for pk, source_id, target_id in links:
+            current.setdefault(source_id, {})[target_id] = pk
+
+    stale, missing, changed = [], [], set()
+    for source_id, target_ids in wanted.items():
+        linked = current.get(source_id, {})
+        removed = [pk for target_id, pk in linked.items()
+                   if target_id not in target_ids]
+        added = [target_id for target_id in target_ids
+                 if target_id not in linked]
+        stale.extend(removed)
+        missing.extend(
+            through(**{source: source_id, target: target_id})
+            for target_id in sorted(added)
+        )
+        if removed or added:
+            changed.add(source_id)
+    if stale:
+        through.objects.filter(pk__in=stale).delete()
+    if missing:
+        through.objects.bulk_create(
+            missing, batch_size=get_option('BATCH_SIZE')
+        )
+    return changed
+
+
+class BulkMixin:
+    """Create, update or delete arrays of objects in one request.
+
+    ``POST``/``PATCH`` ``<list>/bulk/`` take a list of objects (updates
+    need their ``id``) and ``DELETE`` takes ``{"ids": [...]}``. Every item
+    is validated before anything is written; if any fails, nothing is
+    and the response lists the errors by position. Relations named in
+    ``bulk_relations`` are given as id lists and checked with one query
+    per relation.
+    """
+    bulk_serializer_class = None
+    bulk_relations = ()
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False,
+            url_path='bulk')
+    def bulk(self, request):
+        """Write a batch of objects in a single transaction"""
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError(
+                {'non_field_errors': ['Expected a list of items.']}
+            )
+        if len(items) > get_option('MAX_ITEMS'):
+            raise ValidationError({'non_field_errors': [
+                f'At most {get_option("MAX_ITEMS")} items are allowed.'
+            ]})
+
+        partial = request.method == 'PATCH'
+        validated, errors = self._validate_items(items, partial)
+        instances = self._bulk_instances(validated, errors) \
+            if partial else None
+        self._check_relations(validated, errors)
+        self.check_bulk_items(validated, errors, instances)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if partial:
+                ids = self.perform_bulk_update(instances, validated)
+            else:
+                ids = self.perform_bulk_create(validated)
+        code = status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        return Response(self._bulk_representation(ids), status=code)
+
+    def bulk_destroy(self, request):
+        """Delete the objects listed in ``ids``"""
+        ids = request.data.get('ids') if hasattr(request.data, 'get') \
+            else None
+        if not isinstance(ids, list) or not all(
+                isinstance(pk, int) and not isinstance(pk, bool)
+                for pk in ids):
+            raise ValidationError({'ids': ['Expected a list of ids.']})
+        queryset = self.get_queryset().filter(pk__in=ids)
+        found = set(queryset.values_list('pk', flat=True))
+        errors = [{} if pk in found else {'id': ['Not found.']}
+                  for pk in ids]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=found).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def _validate_items(self, items, partial):
+        """Validate every item, returning its data or its errors"""
+        child = self.bulk_serializer_class(
+            many=True, partial=partial,
+            context=self.get_serializer_context()
+        ).child
+        validated, errors = [], []
+        for item in items:
+            try:
+                validated.append(child.run_validation(item))
+                errors.append({})
+            except ValidationError as exc:
+                validated.append(None)
+                errors.append(exc.detail)
+        return validated, errors
+
+    def check_bulk_items(self, validated, errors, instances):
+        """Hook adding errors that need the whole batch, e.g. uniqueness"""
+
+    def _bulk_instances(self, validated, errors):
+        """Load the objects targeted by an update with one query"""
+        ids = [item and item.get('id') for item in validated]
+        instances = self.queryset.model.objects.filter(
+            user=self.request.user, pk__in=[pk for pk in ids if pk]
+        ).in_bulk()
+        seen = set()
+        for error, item, pk in zip(errors, validated, ids):
+            if item is None:
+                continue
+            if pk is None:
+                error['id'] = ['This field is required.']
+            elif pk not in instances:
+                error['id'] = ['Not found.']
+            elif pk in seen:
+                error['id'] = ['Duplicate id.']
+            seen.add(pk)
+        return instances
+
+    def _check_relations(self, validated, errors):
+        """Resolve the related ids of all items, one query per relation"""
+        model = self.queryset.model
+        for relation in self.bulk_relations:
+            related = model._meta.get_field(relation).related_model
+            items = [item or {} for item in validated]
+            requested = set()
+            for item in items:
+                requested.update(item.get(relation, ()))
+            existing = set(related.objects.filter(
+                user=self.request.user, pk__in=requested
+            ).values_list('pk', flat=True))
+            for error, item in zip(errors, items):
+                unknown = [pk for pk in item.get(relation, ())
+                           if pk not in existing]
+                if unknown:
+                    error[relation] = [
+                        f'Invalid pk "{pk}" - object does not exist.'
+                        for pk in unknown
+                    ]
+
+    def _split(self, item):
+        """Separate scalar fields from relation id lists"""
+        fields = {key: value for key, value in item.items()
+                  if key not in self.bulk_relations and key != 'id'}
+        relations = {key: set(item[key]) for key in self.bulk_relations
+                     if key in item}
+        return fields, relations
+
+    def perform_bulk_create(self, validated):
+        """Insert all objects and their relations, returning their ids"""
+        model = self.queryset.model
+        user = self.request.user
+        objs, relations = [], []
+        for item in validated:
+            fields, links = self._split(item)
+            objs.append(model(user=user, **fields))
+            relations.append(links)
+        insert_objects(model, objs)
+        for relation in self.bulk_relations:
+            set_relations(model, relation, {
+                obj.pk: links.get(relation, set())
+                for obj, links in zip(objs, relations)
+            }, new=True)
+        ids = [obj.pk for obj in objs]
+        objects_changed(user.pk, model, ids)
+        return ids
+
+    def perform_bulk_update(self, instances, validated):
+        """Write the changed fields and links of all objects"""
+        model = self.queryset.model
+        now = timezone.now()
+        objs, names = [], {'updated_at'}
+        wanted = {relation: {} for relation in self.bulk_relations}
+        for item in validated:
+            obj = instances[item['id']]
+            fields, links = self._split(item)
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            names.update(fields)
+            obj.updated_at = now
+            objs.append(obj)
+            for relation, ids in links.items():
+                wanted[relation][obj.pk] = ids
+        model.objects.bulk_update(
+            objs, sorted(names), batch_size=get_option('BATCH_SIZE')
+        )
+        for relation, links in wanted.items():
+            if links:
+                set_relations(model, relation, links)
+        ids = [obj.pk for obj in objs]
+        objects_changed(self.request.user.pk, model, ids)
+        return ids
+
+    def _bulk_representation(self, ids):
+        """Serialize the written objects in request order"""
+        objs = self.get_queryset().filter(pk__in=ids).in_bulk()
+        serializer = self.get_serializer(
+            [objs[pk] for pk in ids], many=True
+        )
+        return serializer.data
@@ -0,0 +1,102 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conditional import conditional_response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+def get_option(name):
+    """Return a RESPONSE_CACHE option, falling back to the default"""
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    """Return the cache backend holding responses and generations"""
+    return caches[get_option('ALIAS')]
+
+
+def _generation_key(user_id):
+    return f'recipe-gen:{user_id}'
+
+
+def get_generation(user_id):
+    """Return the current cache generation of a user's recipe data.
+
+    Generations are random tokens rather than counters so an evicted key
+    can never be recreated with a value older entries were stored under.
+    """
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_user(user_id):
+    """Start a new generation, orphaning every cached response of a user"""
+    get_cache().set(_generation_key(user_id), uuid.uuid4().hex, None)
+
+
+def invalidate_user_on_commit(user_id):
+    """Invalidate now and again once the current transaction commits.
+
+    The second bump orphans anything a concurrent request cached from the
+    pre-commit state under the generation started by the first one.
+    """
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def response_key(request):
+    """Return the cache key of a list response for the requesting user"""
+    user_id = request.user.pk
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f'recipe-resp:{user_id}:{get_generation(user_id)}:{url}'
+
+
+class CachedListMixin:
+    """Serve list responses from a per-user cache.
+
+    Entries are keyed by the user's generation, which the model signals in
+    ``recipe.signals`` replace whenever a tag, ingredient or recipe of that
+    user changes, so a hit needs no database query at all. With several
+    worker processes ``RESPONSE_CACHE['ALIAS']`` must name a cache shared
+    between them (file based or memcached) for invalidation to be seen.
+    The ETag is cached with the data, so revalidation hits answer 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not get_option('ENABLED'):
+            return super().list(request, *args, **kwargs)
+        cache = get_cache()
+        key = response_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            data, etag = entry
+            if etag is None:
+                return Response(data)
+            return conditional_response(
+                request, etag, None, lambda: Response(data)
+            )
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                (response.data, response.get('ETag')),
+                get_option('TIMEOUT')
+            )
+        return response
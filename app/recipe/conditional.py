@@ -0,0 +1,132 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Return a weak ETag over the given validator parts.
+
+    Weak because the JSON and browsable renderings of the same state share
+    it; ``Vary: Accept`` keeps shared caches from mixing them up.
+    """
+    digest = hashlib.sha1(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def collection_state(queryset, relations=()):
+    """Return the row count and latest ``updated_at`` of a queryset.
+
+    The latest ``updated_at`` of each of the given relations follows, for
+    representations that nest related objects.
+    """
+    state = queryset.order_by().aggregate(
+        Count('pk', distinct=bool(relations)),
+        Max('updated_at'),
+        *(Max(f'{relation}__updated_at') for relation in relations)
+    )
+    return tuple(
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in state.values()
+    )
+
+
+def add_validators(response, etag, last_modified=None):
+    """Attach the validators and the headers the representation varies on"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Accept', 'Authorization'))
+    return response
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    """Answer 304 when the client's validators match, else build the body"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp())
+    )
+    if response is None:
+        response = get_response()
+        if not 200 <= response.status_code < 300:
+            return response
+    return add_validators(response, etag, last_modified)
+
+
+class ConditionalListMixin:
+    """ETag revalidation of list responses without serializing them.
+
+    The ETag covers the row count and newest ``updated_at`` of the filtered
+    queryset plus the query string, so any edit, insert or delete changes
+    it. Views nesting related objects in their lists name the relations in
+    ``get_list_relations`` so their ``updated_at`` is covered as well.
+    Lists send no Last-Modified: deleting a row cannot advance the newest
+    timestamp, so ``If-Modified-Since`` would revalidate stale lists.
+    """
+
+    def get_list_relations(self):
+        """Return the relations nested in the list representation"""
+        return ()
+
+    def get_list_state(self, queryset):
+        """Return the values the list ETag is computed from"""
+        return collection_state(queryset, self.get_list_relations())
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = make_etag(
+            request.user.pk,
+            request.get_full_path(),
+            *self.get_list_state(queryset)
+        )
+        return conditional_response(
+            request, etag, None,
+            lambda: super(ConditionalListMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+
+class ConditionalRetrieveMixin:
+    """ETag and Last-Modified revalidation of detail responses.
+
+    Validators come from the newest ``updated_at`` of the object and of the
+    relations named in ``conditional_relations``, which the detail
+    representation nests and which can be renamed independently.
+    """
+    conditional_relations = ()
+
+    def get_object_state(self):
+        """Return the newest timestamps of the object and its relations"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return self.get_queryset().order_by().filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).aggregate(
+                Max('updated_at'),
+                *(Max(f'{relation}__updated_at')
+                  for relation in self.conditional_relations)
+            )
+        except (TypeError, ValueError):
+            return {}
+
+    def retrieve(self, request, *args, **kwargs):
+        state = self.get_object_state()
+        if state.get('updated_at__max') is None:
+            return super().retrieve(request, *args, **kwargs)
+        timestamps = [value for value in state.values() if value is not None]
+        etag = make_etag(
+            request.user.pk,
+            request.get_full_path(),
+            *(value and value.isoformat() for value in state.values())
+        )
+        return conditional_response(
+            request, etag, max(timestamps),
+            lambda: super(ConditionalRetrieveMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
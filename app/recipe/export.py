@@ -0,0 +1,119 @@
+import csv
+from itertools import islice
+
+import orjson
+from django.conf import settings
+
+from core.models import Recipe
+
+DEFAULTS = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Columns of an exported recipe, in CSV header order
+FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'tags',
+          'ingredients', 'updated_at')
+
+RELATIONS = ('tags', 'ingredients')
+
+# Encoded lines joined into each chunk handed to the response
+BLOCK_LINES = 500
+
+# type parameter -> (content type, file extension)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+
+def get_option(name):
+    """Return an EXPORT option, falling back to the default"""
+    return getattr(settings, 'EXPORT', {}).get(name, DEFAULTS[name])
+
+
+def _related_names(relation, recipe_ids):
+    """Map recipe ids to the sorted names of their tags or ingredients"""
+    field = Recipe._meta.get_field(relation)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    names = {}
+    for recipe_id, name in through.objects.filter(
+        **{f'{source}_id__in': recipe_ids}
+    ).order_by(f'{target}__name').values_list(f'{source}_id',
+                                              f'{target}__name'):
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def iter_records(user_id, chunk_size=None):
+    """Yield every recipe of a user as a plain dict, in id order.
+
+    Rows are read through ``iterator()`` (a server-side cursor on
+    PostgreSQL) and the tag and ingredient names are fetched per chunk,
+    so memory stays bounded by ``chunk_size`` whatever the library size.
+    """
+    chunk_size = chunk_size or get_option('CHUNK_SIZE')
+    rows = Recipe.objects.filter(user_id=user_id).order_by('id').values_list(
+        'id', 'title', 'time_minutes', 'price', 'link', 'updated_at'
+    ).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        ids = [row[0] for row in chunk]
+        related = {
+            relation: _related_names(relation, ids) for relation in RELATIONS
+        }
+        for pk, title, time_minutes, price, link, updated_at in chunk:
+            yield {
+                'id': pk,
+                'title': title,
+                'time_minutes': time_minutes,
+                'price': str(price),
+                'link': link,
+                'tags': related['tags'].get(pk, []),
+                'ingredients': related['ingredients'].get(pk, []),
+                'updated_at': updated_at.isoformat(),
+            }
+
+
+def ndjson_lines(records):
+    """Encode records as newline delimited JSON"""
+    for record in records:
+        yield orjson.dumps(record) + b'\n'
+
+
+class _Line:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    """Encode records as CSV rows, relation name lists as JSON arrays"""
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS).encode()
+    for record in records:
+        yield writer.writerow([
+            orjson.dumps(record[name]).decode() if name in RELATIONS
+            else record[name]
+            for name in FIELDS
+        ]).encode()
+
+
+ENCODERS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def export_stream(user_id, export_type, chunk_size=None):
+    """Yield a user's recipes encoded as ``export_type``, in line blocks"""
+    lines = ENCODERS[export_type](iter_records(user_id, chunk_size))
+    while True:
+        block = b''.join(islice(lines, BLOCK_LINES))
+        if not block:
+            return
+        yield block
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.db import connections
+from django.db.models import IntegerField, OuterRef, Subquery
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ENABLED': False,
+}
+
+
+def get_option(name):
+    """Return a FAST_LIST option, falling back to the default"""
+    return getattr(settings, 'FAST_LIST', {}).get(name, DEFAULTS[name])
+
+
+def _through(model, relation):
+    """Return the through model and its source and target columns"""
+    field = model._meta.get_field(relation)
+    return (field.remote_field.through,
+            field.m2m_field_name() + '_id',
+            field.m2m_reverse_field_name() + '_id')
+
+
+def _alias(relation):
+    return f'{relation}_ids'
+
+
+def annotate_related_ids(queryset, relations):
+    """Aggregate the related ids of each row into arrays on PostgreSQL.
+
+    Each relation is a correlated ``ARRAY_AGG`` over its through table,
+    so the rows and all their links come back in a single query. Other
+    backends are left alone and served by ``attach_related_ids``.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset
+    for relation in relations:
+        through, source, target = _through(queryset.model, relation)
+        ids = through.objects.filter(
+            **{source: OuterRef('pk')}
+        ).order_by().values(source).annotate(
+            ids=ArrayAgg(target, ordering=target)
+        ).values('ids')
+        queryset = queryset.annotate(**{_alias(relation): Subquery(
+            ids, output_field=ArrayField(IntegerField())
+        )})
+    return queryset
+
+
+def attach_related_ids(model, rows, relations):
+    """Store the sorted related ids of each row under the relation name.
+
+    Uses the arrays of ``annotate_related_ids`` when present, otherwise
+    reads each through table once for the whole page.
+    """
+    for relation in relations:
+        alias = _alias(relation)
+        if rows and alias in rows[0]:
+            for row in rows:
+                row[relation] = row.pop(alias) or []
+            continue
+        through, source, target = _through(model, relation)
+        linked = {row['id']: [] for row in rows}
+        links = through.objects.filter(
+            **{f'{source}__in': list(linked)}
+        ).order_by(target).values_list(source, target)
+        for source_id, target_id in links:
+            linked[source_id].append(target_id)
+        for row in rows:
+            row[relation] = linked[row['id']]
+
+
+def decimal_formatter(field):
+    """Return a function rendering a model DecimalField like DRF does"""
+    pattern = '{:.%df}' % field.decimal_places
+
+    def format_decimal(value):
+        return None if value is None else pattern.format(value)
+    return format_decimal
+
+
+class FastListMixin:
+    """Opt-in list rendering from ``values()`` rows, skipping serializers.
+
+    With ``FAST_LIST['ENABLED']`` set, views declaring
+    ``fast_list_columns`` load those columns (and the ids of
+    ``fast_list_relations``) as dicts and shape each row with
+    ``fast_list_row``, which must return exactly what the list serializer
+    would. Everything but the list action keeps using the serializer.
+    """
+    fast_list_columns = None
+    fast_list_relations = ()
+
+    def use_fast_list(self):
+        """Return whether this request is served by the fast path"""
+        return bool(self.fast_list_columns) and get_option('ENABLED')
+
+    def fast_list_row(self, row):
+        """Return the representation of one row"""
+        return {name: row[name] for name in self.fast_list_columns}
+
+    def _fast_list_ordering(self):
+        """Return the ordering columns the paginator reads from rows"""
+        ordering = self.get_ordering() if hasattr(self, 'get_ordering') \
+            else self.ordering
+        return [field.lstrip('-') for field in ordering]
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = list(self.fast_list_columns)
+        columns += [name for name in self._fast_list_ordering()
+                    if name not in columns]
+        queryset = annotate_related_ids(
+            queryset.prefetch_related(None), self.fast_list_relations
+        )
+        columns += [_alias(relation) for relation in self.fast_list_relations
+                    if _alias(relation) in queryset.query.annotations]
+        queryset = queryset.values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        attach_related_ids(queryset.model, rows, self.fast_list_relations)
+        data = [self.fast_list_row(row) for row in rows]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,40 @@
+from core.models import Recipe, Tag
+
+from .cache import invalidate_user_on_commit
+from .sync import record_changes, touch_recipes
+
+
+def _reindex(model, ids):
+    """Refresh the search vectors depending on the given objects"""
+    if model is Recipe:
+        Recipe.objects.filter(pk__in=ids).update_search_vector()
+    else:
+        relation = 'tags' if model is Tag else 'ingredients'
+        Recipe.objects.filter(
+            **{f'{relation}__in': ids}
+        ).update_search_vector()
+
+
+def objects_changed(user_id, model, ids):
+    """Run the save hooks for objects written without model signals.
+
+    ``bulk_create``, ``bulk_update`` and through table inserts skip
+    ``recipe.signals``, so callers must report the rows they wrote here to
+    keep the change log, search vectors and response cache consistent.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    record_changes(user_id, model, ids)
+    _reindex(model, ids)
+    invalidate_user_on_commit(user_id)
+
+
+def recipe_relations_changed(user_id, recipe_ids):
+    """Run the hooks for recipes whose links were written directly"""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    touch_recipes(Recipe.objects.filter(pk__in=recipe_ids))
+    _reindex(Recipe, recipe_ids)
+    invalidate_user_on_commit(user_id)
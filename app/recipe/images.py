@@ -0,0 +1,306 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+from core.storage import content_addressed_name
+
+from .cache import invalidate_user
+from .sync import record_changes
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MODE': 'thread',
+    'WORKERS': 2,
+    'QUALITY': 85,
+    'MAX_DIMENSION': 2048,
+    'WEBP': True,
+    'EAGER_VARIANTS': ['thumbnail'],
+    'VARIANT_MAX_AGE_DAYS': 30,
+    'VARIANT_CACHE_BYTES': None,
+}
+
+# Longest edge in pixels of each resized variant
+VARIANTS = {
+    'thumbnail': 150,
+    'medium': 600,
+    'large': 1200,
+}
+
+# File extension -> Pillow encoder of the variant formats
+FORMATS = {
+    'jpg': 'JPEG',
+    'webp': 'WEBP',
+}
+
+VARIANT_RE = re.compile(
+    r'_(?P<variant>%s)\.(?P<ext>%s)$' % ('|'.join(VARIANTS), '|'.join(FORMATS))
+)
+
+# Only refresh a variant's mtime (its last access time) this often
+TOUCH_INTERVAL = 3600
+
+# Image locks of this process on backends without advisory locks
+_local_locks = [threading.RLock() for _ in range(64)]
+
+
+def get_option(name):
+    """Return an IMAGE_PROCESSING option, falling back to the default"""
+    return getattr(settings, 'IMAGE_PROCESSING', {}).get(name, DEFAULTS[name])
+
+
+def enabled_formats():
+    """Return the variant file extensions currently generated"""
+    return ['jpg', 'webp'] if get_option('WEBP') else ['jpg']
+
+
+def variant_name(name, variant, ext='jpg'):
+    """Return the storage name of a variant stored next to the original"""
+    stem, _ = os.path.splitext(name)
+    return f'{stem}_{variant}.{ext}'
+
+
+def encode(image, max_dimension, image_format='JPEG'):
+    """Downscale to max_dimension and encode without any metadata"""
+    image = image.copy()
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    buffer = BytesIO()
+    options = {'quality': get_option('QUALITY')}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def load(storage, name):
+    """Decode a stored image upright, flattened to RGB"""
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        image.load()
+    return image
+
+
+def save_variant(storage, name, variant, ext, image):
+    """Encode and store one variant, returning its storage name"""
+    path = variant_name(name, variant, ext)
+    saved = storage.save(
+        path, ContentFile(encode(image, VARIANTS[variant], FORMATS[ext]))
+    )
+    if saved != path:
+        # Another worker generated it concurrently; keep theirs.
+        storage.delete(saved)
+    return path
+
+
+def ensure_variant(storage, name, variant, ext='jpg'):
+    """Return a variant's storage name, generating it on first request"""
+    path = variant_name(name, variant, ext)
+    if storage.exists(path):
+        touch(storage, path)
+        return path
+    return save_variant(storage, name, variant, ext, load(storage, name))
+
+
+def touch(storage, path):
+    """Record an access by bumping the file mtime at most once per interval"""
+    full_path = storage.path(path)
+    try:
+        if time.time() - os.stat(full_path).st_mtime > TOUCH_INTERVAL:
+            os.utime(full_path)
+    except FileNotFoundError:
+        pass
+
+
+def lock_key(name):
+    """Return the signed 64 bit advisory lock key of an image name"""
+    digest = hashlib.sha256(f'recipe-image:{name}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+@contextmanager
+def image_lock(name):
+    """Hold the lock of a stored image until the transaction commits.
+
+    Content addressed names are shared, so the save that reuses an
+    existing file and the write referencing it must not interleave with
+    ``release_image`` checking that nothing references the file and
+    deleting it. On PostgreSQL this is a transaction level advisory lock
+    on the name, released at the outermost commit; elsewhere a lock of
+    this process held for the block, which only serializes threads of one
+    process and should be taken outside any other transaction.
+    """
+    connection = connections[Recipe.objects.db]
+    with transaction.atomic(using=connection.alias):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)', [lock_key(name)]
+                )
+            yield
+        else:
+            with _local_locks[lock_key(name) % len(_local_locks)]:
+                yield
+
+
+def release_image(storage, name):
+    """Delete an image and its variants once no recipe references it"""
+    if not name:
+        return
+    with image_lock(name):
+        if not Recipe.objects.filter(image=name).exists():
+            delete_image_files(storage, name)
+
+
+def delete_image_files(storage, name):
+    """Remove an original image and all of its variants"""
+    if not name:
+        return
+    paths = [name] + [
+        variant_name(name, variant, ext)
+        for variant in VARIANTS for ext in FORMATS
+    ]
+    for path in paths:
+        if storage.exists(path):
+            storage.delete(path)
+
+
+def prune_variants(storage, root, max_age_days=None, max_bytes=None,
+                   keep=()):
+    """Evict rarely requested variants from the on-disk derivative cache.
+
+    Variants not requested for ``max_age_days`` are removed, then the least
+    recently requested ones until the cache fits in ``max_bytes``. Variants
+    listed in ``keep`` and all originals are never touched; anything evicted
+    is regenerated on its next request. Returns ``(files, bytes)`` removed.
+    """
+    entries = []
+    for directory, _, files in os.walk(storage.path(root)):
+        for filename in files:
+            match = VARIANT_RE.search(filename)
+            if not match or match.group('variant') in keep:
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = freed = 0
+    for mtime, size, path in entries:
+        expired = max_age_days is not None and \
+            now - mtime > max_age_days * 86400
+        over_budget = max_bytes is not None and total > max_bytes
+        if not expired and not over_budget:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def image_urls(recipe, request=None):
+    """Return the size map of a processed recipe image"""
+    if not recipe.image or recipe.image_status != Recipe.IMAGE_READY:
+        return None
+    return stored_image_urls(recipe.image.storage, recipe.image.name, request)
+
+
+def stored_image_urls(storage, name, request=None):
+    """Return the size map of a processed image from its storage name"""
+    def absolute(url):
+        return request.build_absolute_uri(url) if request else url
+
+    urls = {'original': absolute(storage.url(name))}
+    for ext in enabled_formats():
+        sizes = {
+            variant: absolute(reverse(
+                'recipe:image-variant',
+                kwargs={'name': name, 'variant': variant, 'ext': ext}
+            ))
+            for variant in VARIANTS
+        }
+        if ext == 'jpg':
+            urls.update(sizes)
+        else:
+            urls[ext] = sizes
+    return urls
+
+
+def process_recipe_image(recipe_id):
+    """Re-encode a pending upload and generate its eager variants.
+
+    The recipe row acts as the queue entry: it is claimed by moving it from
+    ``pending`` to ``processing`` and only swapped to the processed file if
+    the raw upload is still the recipe's image, so a newer upload that
+    arrived meanwhile is never overwritten. Variants not listed in
+    ``EAGER_VARIANTS`` are generated when first requested. Identical
+    uploads encode to the same content addressed name, so their files are
+    written once and shared. Saving the processed file and swapping the
+    recipe onto it hold ``image_lock``, so a concurrent ``release_image``
+    of the same name cannot delete the file in between.
+    """
+    claimed = Recipe.objects.filter(
+        pk=recipe_id, image_status=Recipe.IMAGE_PENDING
+    ).update(
+        image_status=Recipe.IMAGE_PROCESSING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return
+    recipe = Recipe.objects.only('id', 'user', 'image').get(pk=recipe_id)
+    record_changes(recipe.user_id, Recipe, [recipe_id])
+    storage = recipe.image.storage
+    raw_name = recipe.image.name
+    processed_name = None
+    try:
+        image = load(storage, raw_name)
+        encoded = encode(image, get_option('MAX_DIMENSION'))
+        processed_name = content_addressed_name(
+            'uploads/recipe/', hashlib.sha256(encoded).hexdigest(), 'jpg'
+        )
+        with image_lock(processed_name):
+            storage.save(processed_name, ContentFile(encoded))
+            for variant in get_option('EAGER_VARIANTS'):
+                for ext in enabled_formats():
+                    save_variant(storage, processed_name, variant, ext, image)
+            swapped = Recipe.objects.filter(
+                pk=recipe_id, image=raw_name
+            ).update(
+                image=processed_name,
+                image_status=Recipe.IMAGE_READY,
+                updated_at=timezone.now()
+            )
+    except Exception:
+        logger.exception('Failed to process image of recipe %s', recipe_id)
+        release_image(storage, processed_name)
+        Recipe.objects.filter(pk=recipe_id, image=raw_name).update(
+            image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()
+        )
+        record_changes(recipe.user_id, Recipe, [recipe_id])
+        invalidate_user(recipe.user_id)
+        return
+
+    if swapped:
+        record_changes(recipe.user_id, Recipe, [recipe_id])
+        invalidate_user(recipe.user_id)
+    release_image(storage, raw_name if swapped else processed_name)
@@ -0,0 +1,215 @@
+import csv
+from io import StringIO
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+
+from .bulk import get_or_create_by_name, insert_objects, set_relations
+from .hooks import objects_changed
+
+DEFAULTS = {
+    'BATCH_SIZE': 5000,
+}
+
+# Scalar recipe fields read from each record, with their defaults
+FIELDS = {
+    'title': None,
+    'time_minutes': None,
+    'price': None,
+    'link': '',
+}
+
+RELATIONS = {'tags': Tag, 'ingredients': Ingredient}
+
+NAME_MAX_LENGTH = 255
+
+
+def get_option(name):
+    """Return an IMPORT option, falling back to the default"""
+    return getattr(settings, 'IMPORT', {}).get(name, DEFAULTS[name])
+
+
+def read_records(stream, import_type):
+    """Yield ``(line, record)`` pairs of an NDJSON or CSV text stream.
+
+    The formats are those of ``recipe.export``; CSV cells of tag and
+    ingredient names hold JSON arrays. Undecodable lines yield the error
+    in place of the record.
+    """
+    if import_type == 'ndjson':
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                yield line, orjson.loads(text)
+            except orjson.JSONDecodeError as exc:
+                yield line, ValidationError(f'Invalid JSON: {exc}')
+        return
+    reader = csv.DictReader(stream)
+    for row in reader:
+        try:
+            for relation in RELATIONS:
+                row[relation] = orjson.loads(row.get(relation) or '[]')
+        except orjson.JSONDecodeError:
+            row = ValidationError(f'{relation} must be a JSON array')
+        yield reader.line_num, row
+
+
+def clean_record(record):
+    """Return the validated fields and relation names of a record"""
+    if not isinstance(record, dict):
+        raise ValidationError('Expected an object')
+    cleaned = {}
+    for name, default in FIELDS.items():
+        value = record.get(name, default)
+        try:
+            cleaned[name] = Recipe._meta.get_field(name).clean(value, None)
+        except ValidationError as exc:
+            raise ValidationError(f'{name}: {" ".join(exc.messages)}')
+    for relation in RELATIONS:
+        names = record.get(relation) or []
+        if not isinstance(names, list) or \
+                not all(isinstance(name, str) for name in names):
+            raise ValidationError(f'{relation}: expected a list of names')
+        names = [' '.join(name.split()) for name in names]
+        if any(not name or len(name) > NAME_MAX_LENGTH for name in names):
+            raise ValidationError(f'{relation}: invalid name')
+        cleaned[relation] = names
+    return cleaned
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Load rows into a table with PostgreSQL ``COPY ... FROM STDIN``"""
+    buffer = StringIO()
+    # Quoted empty strings stay strings; COPY reads bare empties as NULL
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+    buffer.seek(0)
+    quote = cursor.db.ops.quote_name
+    cursor.copy_expert(
+        f'COPY {quote(table)} ({", ".join(map(quote, columns))}) '
+        f'FROM STDIN WITH (FORMAT csv)',
+        buffer
+    )
+
+
+class RecipeImporter:
+    """Load validated records into one user's library in batches.
+
+    Tag and ingredient names are resolved through a map of the user's
+    names, read once and extended as batches create new ones. On
+    PostgreSQL recipes and links are written with ``COPY`` using ids
+    reserved from the sequence; other backends use ``bulk_create``.
+    Every batch runs the hooks of ``recipe.hooks`` for the rows it wrote.
+    """
+
+    def __init__(self, user, batch_size=None):
+        self.user = user
+        self.batch_size = batch_size or get_option('BATCH_SIZE')
+        self.connection = connections[Recipe.objects.db]
+        self.use_copy = self.connection.vendor == 'postgresql'
+        self.names = {}
+        self.imported = self.links = 0
+        self.errors = []
+
+    def run(self, records, progress=None):
+        """Import ``(line, record)`` pairs, collecting invalid lines"""
+        records = iter(records)
+        while True:
+            batch = []
+            for line, record in islice(records, self.batch_size):
+                try:
+                    if isinstance(record, ValidationError):
+                        raise record
+                    batch.append(clean_record(record))
+                except ValidationError as exc:
+                    self.errors.append((line, ' '.join(exc.messages)))
+            if not batch:
+                return
+            with transaction.atomic(using=self.connection.alias):
+                self._import_batch(batch)
+            if progress:
+                progress(self)
+
+    def _name_map(self, relation):
+        """Return the user's lowercased names of a relation mapped to ids"""
+        if relation not in self.names:
+            self.names[relation] = dict(RELATIONS[relation].objects.filter(
+                user=self.user
+            ).annotate(lower_name=Lower('name')).values_list(
+                'lower_name', 'pk'
+            ))
+        return self.names[relation]
+
+    def _resolve(self, relation, batch):
+        """Return the related ids of each record, creating missing names"""
+        known = self._name_map(relation)
+        missing = {}
+        for record in batch:
+            for name in record[relation]:
+                if name.lower() not in known:
+                    missing.setdefault(name.lower(), name)
+        known.update(get_or_create_by_name(
+            RELATIONS[relation], self.user, list(missing.values())
+        ))
+        return [{known[name.lower()] for name in record[relation]}
+                for record in batch]
+
+    def _import_batch(self, batch):
+        """Write one batch of cleaned records and their links"""
+        links = {relation: self._resolve(relation, batch)
+                 for relation in RELATIONS}
+        if self.use_copy:
+            ids = self._copy_recipes(batch)
+        else:
+            ids = [obj.pk for obj in insert_objects(Recipe, [
+                Recipe(user=self.user, **{
+                    name: record[name] for name in FIELDS
+                }) for record in batch
+            ])]
+        for relation, targets in links.items():
+            wanted = dict(zip(ids, targets))
+            if self.use_copy:
+                self._copy_links(relation, wanted)
+            else:
+                set_relations(Recipe, relation, wanted, new=True)
+            self.links += sum(len(target) for target in targets)
+        objects_changed(self.user.pk, Recipe, ids)
+        self.imported += len(ids)
+
+    def _copy_recipes(self, batch):
+        """COPY recipe rows with ids reserved up front, returning the ids"""
+        table = Recipe._meta.db_table
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [table, len(batch)]
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            now = timezone.now().isoformat()
+            copy_rows(
+                cursor, table,
+                ['id', 'user_id', *FIELDS, 'image_status', 'updated_at'],
+                ([pk, self.user.pk, *(record[name] for name in FIELDS),
+                  '', now] for pk, record in zip(ids, batch))
+            )
+        return ids
+
+    def _copy_links(self, relation, wanted):
+        """COPY the through table rows of a relation"""
+        field = Recipe._meta.get_field(relation)
+        with self.connection.cursor() as cursor:
+            copy_rows(
+                cursor, field.remote_field.through._meta.db_table,
+                [field.m2m_column_name(), field.m2m_reverse_name()],
+                ([recipe_id, target_id]
+                 for recipe_id, targets in wanted.items()
+                 for target_id in sorted(targets))
+            )
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.export import FORMATS, export_stream, get_option
+
+
+class Command(BaseCommand):
+    """Export the recipe library of a user"""
+    help = 'Write all recipes of a user as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to export')
+        parser.add_argument(
+            '--type', choices=sorted(FORMATS), default='ndjson',
+            help='Output format'
+        )
+        parser.add_argument(
+            '--output', help='File to write to instead of stdout'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=get_option('CHUNK_SIZE'),
+            help='Recipes read from the database per round trip'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+        blocks = export_stream(user.pk, options['type'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for block in blocks:
+                    output.write(block)
+        else:
+            for block in blocks:
+                self.stdout.write(block.decode(), ending='')
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import RecipeImporter, get_option, read_records
+
+# Invalid lines listed individually before only their count is reported
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    """Bulk load recipes into the library of a user"""
+    help = 'Import recipes from an NDJSON or CSV export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the receiving user')
+        parser.add_argument('path', help='File to read, - for stdin')
+        parser.add_argument(
+            '--type', choices=['csv', 'ndjson'],
+            help='Input format, guessed from the file extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=get_option('BATCH_SIZE'),
+            help='Records written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+        path = options['path']
+        import_type = options['type'] or \
+            ('csv' if path.lower().endswith('.csv') else 'ndjson')
+
+        importer = RecipeImporter(user, options['batch_size'])
+        progress = self._progress if options['verbosity'] > 1 else None
+        start = time.monotonic()
+        stream = sys.stdin if path == '-' else \
+            open(path, newline='', encoding='utf-8')
+        try:
+            importer.run(read_records(stream, import_type), progress)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = max(time.monotonic() - start, 1e-6)
+
+        for line, message in importer.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f'Line {line}: {message}')
+        rows = importer.imported + importer.links
+        self.stdout.write(
+            f'Imported {importer.imported} recipes and {importer.links} '
+            f'links in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s), '
+            f'skipped {len(importer.errors)} invalid records'
+        )
+
+    def _progress(self, importer):
+        """Report the running total after each batch"""
+        self.stdout.write(f'{importer.imported} recipes imported')
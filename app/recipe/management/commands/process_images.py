@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """Process recipe images still waiting in the queue"""
+    help = 'Process pending recipe image uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new pending images'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to wait between polls with --loop'
+        )
+        parser.add_argument(
+            '--retry-processing', action='store_true',
+            help='Also requeue images left in processing by a crashed worker'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_processing']:
+            Recipe.objects.filter(
+                image_status=Recipe.IMAGE_PROCESSING
+            ).update(
+                image_status=Recipe.IMAGE_PENDING, updated_at=timezone.now()
+            )
+        while True:
+            pending = list(Recipe.objects.filter(
+                image_status=Recipe.IMAGE_PENDING
+            ).values_list('id', flat=True))
+            for recipe_id in pending:
+                process_recipe_image(recipe_id)
+            if pending:
+                self.stdout.write(f'Processed {len(pending)} images')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
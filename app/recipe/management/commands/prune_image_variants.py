@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import get_option, prune_variants
+
+
+class Command(BaseCommand):
+    """Evict rarely requested image variants from disk"""
+    help = 'Remove image variants that have not been requested recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age-days', type=float,
+            default=get_option('VARIANT_MAX_AGE_DAYS'),
+            help='Remove variants not requested for this many days'
+        )
+        parser.add_argument(
+            '--max-bytes', type=int,
+            default=get_option('VARIANT_CACHE_BYTES'),
+            help='Evict least recently requested variants above this size'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        removed, freed = prune_variants(
+            storage,
+            'uploads/recipe/',
+            max_age_days=options['max_age_days'],
+            max_bytes=options['max_bytes'],
+            keep=get_option('EAGER_VARIANTS'),
+        )
+        self.stdout.write(f'Removed {removed} variants ({freed} bytes)')
@@ -0,0 +1,169 @@
+import base64
+import json
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination seeking on the view ordering instead of OFFSET.
+
+    The view declares ``ordering`` (or ``get_ordering()``) as a tuple of
+    fields ending in a unique column (usually ``id``). The cursor stores
+    the values of those fields for the last row of the page, so fetching
+    page N is a single index range scan no matter how deep N is.
+    Pagination is opt-in: responses are only paginated when ``page_size``
+    or ``cursor`` is sent.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        """Return the requested page size or None when not paginating"""
+        params = request.query_params
+        if self.page_size_query_param not in params:
+            if self.cursor_query_param in params:
+                return self.page_size
+            return None
+        try:
+            size = int(params[self.page_size_query_param])
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of results or None if not paginating"""
+        page_size = self.get_page_size(request)
+        if page_size is None:
+            return None
+
+        self.request = request
+        self.ordering = tuple(
+            view.get_ordering() if hasattr(view, 'get_ordering')
+            else view.ordering
+        )
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, position)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self._seek(ordering, position)
+            )
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self._position(rows[-1])
+            if position is not None and (has_more or not reverse):
+                self.previous_position = self._position(rows[0])
+        return rows
+
+    def get_paginated_response(self, data):
+        """Wrap the page in next/previous links"""
+        return Response(OrderedDict([
+            ('next', self.encode_cursor(self.next_position, False)),
+            ('previous', self.encode_cursor(self.previous_position, True)),
+            ('results', data),
+        ]))
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) encoded in the request cursor"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload['p'], bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or \
+                len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def clean_position(self, model, position):
+        """Convert cursor values to the types of their ordering fields.
+
+        Model fields convert with ``to_python``; annotations such as the
+        search rank only take numbers. Anything else is an invalid cursor
+        rather than an error from the database.
+        """
+        cleaned = []
+        for field, value in zip(self.ordering, position):
+            try:
+                model_field = model._meta.get_field(field.lstrip('-'))
+            except FieldDoesNotExist:
+                model_field = None
+            if value is None or isinstance(value, bool):
+                raise NotFound(self.invalid_cursor_message)
+            if model_field is None:
+                if not isinstance(value, (int, float)):
+                    raise NotFound(self.invalid_cursor_message)
+                cleaned.append(value)
+                continue
+            try:
+                cleaned.append(model_field.to_python(value))
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def encode_cursor(self, position, reverse):
+        """Return the absolute URL of the page after/before a position"""
+        if position is None:
+            return None
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(payload, separators=(',', ':')).encode()
+        ).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _position(self, obj):
+        """Return the ordering values of a row, a model or a values() dict"""
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(obj, dict):
+            return [obj[name] for name in names]
+        return [attrgetter(name)(obj) for name in names]
+
+    @staticmethod
+    def _flip(field):
+        """Reverse the direction of an ordering field"""
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _seek(ordering, position):
+        """Build the row-value comparison selecting rows after position.
+
+        ``(a, b) > (x, y)`` is expressed as ``a >= x AND (a > x OR b > y)``
+        so the leading column still bounds the index range scan.
+        """
+        names = [field.lstrip('-') for field in ordering]
+        ops = ['lt' if field.startswith('-') else 'gt' for field in ordering]
+        after = Q()
+        for i, name in enumerate(names):
+            step = Q(**{f'{name}__{ops[i]}': position[i]})
+            for prev, value in zip(names[:i], position[:i]):
+                step &= Q(**{prev: value})
+            after |= step
+        return Q(**{f'{names[0]}__{ops[0]}e': position[0]}) & after
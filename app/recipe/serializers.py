@@ -1,44 +1,285 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.datastructures import MultiValueDict
 from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.utils import html
 
 
 from core.models import Tag,Ingredient,Recipe
-class SerializerTag(serializers.ModelSerializer):
+
+from .bulk import get_or_create_by_name, set_relations
+from .images import image_urls
+
+
+class UniqueNameMixin:
+    """Reject names the user already has, ignoring case"""
+
+    def validate_name(self, value):
+        """Check the name is not taken by another object of the user"""
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user, name__iexact=value
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'You already have a {self.Meta.model._meta.verbose_name} '
+                f'named "{value}".'
+            )
+        return value
+
+
+class SerializerTag(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
     class Meta:
         model = Tag
         fields = ['id','name']
         read_only_fields = ['id',]
 
-class IngredientSerializer(serializers.ModelSerializer):
+
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for ingredient objects"""
     class Meta:
         model = Ingredient
         fields = ['id','name']
         read_only_fields = ['id']
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class TagBulkSerializer(SerializerTag):
+    """Serializer for tags in a bulk write"""
+    id = serializers.IntegerField(required=False)
+
+    def validate_name(self, value):
+        """Names of the whole batch are checked by the view at once"""
+        return value
+
+
+class IngredientBulkSerializer(IngredientSerializer):
+    """Serializer for ingredients in a bulk write"""
+    id = serializers.IntegerField(required=False)
+
+    def validate_name(self, value):
+        """Names of the whole batch are checked by the view at once"""
+        return value
+
+
+class IdOrNameListField(serializers.Field):
+    """Related objects of the user referenced by primary key or by name.
+
+    Integers, and digit-only strings as sent by form posts, are ids; any
+    other string is a name. Validates to ``{'ids': [...], 'names': [...]}``
+    and renders as the list of related ids.
+    """
+    default_error_messages = {
+        'not_a_list': 'Expected a list of ids or names but got type '
+                      '"{input_type}".',
+        'invalid': 'Expected an id or a name but got "{value}".',
+        'max_length': 'Names are limited to {max_length} characters.',
+    }
+
+    def __init__(self, max_length=255, **kwargs):
+        self.max_length = max_length
+        super().__init__(**kwargs)
+
+    def get_value(self, dictionary):
+        if html.is_html_input(dictionary):
+            if self.field_name not in dictionary and \
+                    getattr(self.root, 'partial', False):
+                return empty
+            if isinstance(dictionary, MultiValueDict):
+                return dictionary.getlist(self.field_name)
+        return dictionary.get(self.field_name, empty)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (str, dict)) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        ids, names = [], []
+        for value in data:
+            if isinstance(value, int) and not isinstance(value, bool):
+                ids.append(value)
+            elif isinstance(value, str) and value.strip().isdigit():
+                ids.append(int(value))
+            elif isinstance(value, str) and value.strip():
+                name = ' '.join(value.split())
+                if len(name) > self.max_length:
+                    self.fail('max_length', max_length=self.max_length)
+                names.append(name)
+            else:
+                self.fail('invalid', value=value)
+        return {'ids': ids, 'names': names}
+
+    def to_representation(self, value):
+        return [obj.pk for obj in value.all()]
+
+
+class SparseFieldsMixin:
+    """Render only ``context['fields']``, nesting ``context['expand']``.
+
+    Both are set by the view from the query string; without them the
+    serializer renders every declared field as usual.
+    """
+    expandable = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        for name in self.context.get('expand', ()):
+            if name in self.fields:
+                self.fields[name] = self.expandable[name](
+                    many=True, read_only=True
+                )
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer a recipe"""
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Ingredient.objects.all()
-    )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all()
-    )
+    images = serializers.SerializerMethodField()
+    ingredients = IdOrNameListField()
+    tags = IdOrNameListField()
+
     class Meta:
         model = Recipe
-        fields = ['id','title','ingredients','tags','time_minutes','price','link']
-        read_only_fields = ['id']
+        fields = ['id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link', 'image_status', 'images']
+        read_only_fields = ['id', 'image_status']
+
+    relation_models = {'tags': Tag, 'ingredients': Ingredient}
+    expandable = {'tags': SerializerTag, 'ingredients': IngredientSerializer}
+
+    def get_images(self, obj):
+        """Return the URLs of the processed image keyed by size"""
+        return image_urls(obj, self.context.get('request'))
+
+    def validate(self, attrs):
+        """Resolve tag and ingredient references with one query each"""
+        for relation, model in self.relation_models.items():
+            if relation in attrs:
+                attrs[relation] = self._resolve(
+                    relation, model, attrs[relation]
+                )
+        return attrs
+
+    def _resolve(self, relation, model, value):
+        """Return the ids found and the names still to be created"""
+        if isinstance(value, list):
+            value = {'ids': value, 'names': []}
+        ids = set(value['ids'])
+        names = {name.lower(): name for name in value['names']}
+        if not ids and not names:
+            return {'ids': set(), 'names': []}
+        found = model.objects.filter(
+            user=self.context['request'].user
+        ).annotate(lower_name=Lower('name')).filter(
+            Q(pk__in=ids) | Q(lower_name__in=names)
+        ).values_list('pk', 'lower_name')
+        found_ids = set()
+        for pk, lower_name in found:
+            found_ids.add(pk)
+            names.pop(lower_name, None)
+        unknown = sorted(ids - found_ids)
+        if unknown:
+            raise serializers.ValidationError({relation: [
+                f'Invalid pk "{pk}" - object does not exist.'
+                for pk in unknown
+            ]})
+        return {'ids': found_ids, 'names': list(names.values())}
+
+    def _create_missing(self, validated_data):
+        """Create the named objects that do not exist yet"""
+        user = self.context['request'].user
+        for relation, model in self.relation_models.items():
+            if relation in validated_data:
+                value = validated_data[relation]
+                validated_data[relation] = sorted(
+                    value['ids'] |
+                    set(get_or_create_by_name(
+                        model, user, value['names']
+                    ).values())
+                )
+
+    def _pop_relations(self, validated_data):
+        """Remove the tag and ingredient ids to link from validated_data"""
+        return {
+            relation: set(validated_data.pop(relation))
+            for relation in self.relation_models
+            if relation in validated_data
+        }
+
+    def create(self, validated_data):
+        """Create the recipe, then link it without per-relation signals.
+
+        The recipe's own save already logged it for delta sync, so the
+        links are inserted directly rather than through ``set()``, whose
+        ``m2m_changed`` handlers would touch and log it again.
+        """
+        with transaction.atomic():
+            self._create_missing(validated_data)
+            relations = self._pop_relations(validated_data)
+            instance = super().create(validated_data)
+            changed = False
+            for relation, ids in relations.items():
+                if set_relations(Recipe, relation, {instance.pk: ids},
+                                 new=True):
+                    changed = True
+            if changed:
+                Recipe.objects.filter(pk=instance.pk).update_search_vector()
+            return instance
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self._create_missing(validated_data)
+            relations = self._pop_relations(validated_data)
+            instance = super().update(instance, validated_data)
+            self._update_relations(instance, relations)
+            return instance
+
+    def _update_relations(self, instance, relations):
+        """Write only the links that differ from the current ones.
+
+        Links prefetched with the instance are compared without a query;
+        otherwise ``set_relations`` reads them once per relation.
+        """
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        changed = False
+        for relation, ids in relations.items():
+            current = prefetched.get(relation)
+            if current is not None and {obj.pk for obj in current} == ids:
+                continue
+            if set_relations(Recipe, relation, {instance.pk: ids}):
+                changed = True
+        if changed:
+            Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer a recipe detail"""
     ingredients = IngredientSerializer(many=True, read_only=True)
     tags = SerializerTag(many=True,read_only=True)
 
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
     class Meta:
         model = Recipe
-        fields = ('id','image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id', 'image', 'image_status')
+        read_only_fields = ('id', 'image_status')
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    """Serializer for recipes in a bulk write, relations as id lists"""
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link']
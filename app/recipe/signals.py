@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Change, Ingredient, Recipe, Tag
+
+from .cache import invalidate_user, invalidate_user_on_commit
+from .images import release_image
+from .sync import record_changes, touch_recipes
+
+
+@receiver(post_delete, sender=Recipe)
+def release_deleted_recipe_image(sender, instance, **kwargs):
+    """Delete the recipe image once no other recipe shares it"""
+    if instance.image:
+        storage, name = instance.image.storage, instance.image.name
+        transaction.on_commit(lambda: release_image(storage, name))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Drop the cached lists of the user owning a changed object"""
+    invalidate_user_on_commit(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_relation_cache(sender, instance, action, **kwargs):
+    """Drop the cached lists when recipe tags or ingredients change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+def log_saved_object(sender, instance, **kwargs):
+    """Log a created or updated object for delta sync"""
+    record_changes(instance.user_id, sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def log_deleted_object(sender, instance, **kwargs):
+    """Leave a tombstone of a deleted object for delta sync"""
+    record_changes(instance.user_id, sender, [instance.pk], deleted=True)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_relation_recipes(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Bump, log and reindex recipes whose tags or ingredients changed"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            now = timezone.now()
+            Recipe.objects.filter(pk=instance.pk).update(updated_at=now)
+            instance.updated_at = now
+            record_changes(instance.user_id, Recipe, [instance.pk])
+            Recipe.objects.filter(pk=instance.pk).update_search_vector()
+    elif action in ('post_add', 'post_remove') and pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+        Recipe.objects.filter(pk__in=pk_set).update_search_vector()
+    elif action == 'pre_clear':
+        relation = 'tags' if sender is Recipe.tags.through else 'ingredients'
+        instance._cleared_recipe_ids = touch_recipes(
+            Recipe.objects.filter(**{relation: instance})
+        )
+    elif action == 'post_clear':
+        Recipe.objects.filter(
+            pk__in=getattr(instance, '_cleared_recipe_ids', [])
+        ).update_search_vector()
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_linked_recipes(sender, instance, **kwargs):
+    """Bump and log recipes losing a tag or ingredient to its deletion"""
+    relation = 'tags' if sender is Tag else 'ingredients'
+    instance._linked_recipe_ids = touch_recipes(
+        Recipe.objects.filter(**{relation: instance})
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def reindex_recipe(sender, instance, update_fields=None, **kwargs):
+    """Recompute the search vector of a saved recipe"""
+    if update_fields is None or 'title' in update_fields:
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def reindex_renamed(sender, instance, created, **kwargs):
+    """Reindex the recipes using a renamed tag or ingredient"""
+    if not created:
+        relation = 'tags' if sender is Tag else 'ingredients'
+        Recipe.objects.filter(
+            **{relation: instance}
+        ).update_search_vector()
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def reindex_unlinked(sender, instance, **kwargs):
+    """Reindex the recipes that lost a deleted tag or ingredient"""
+    Recipe.objects.filter(
+        pk__in=getattr(instance, '_linked_recipe_ids', [])
+    ).update_search_vector()
+
+
+@receiver(post_save, sender=get_user_model())
+def start_user_generation(sender, instance, created, **kwargs):
+    """Give new users a fresh namespace in case their id was reused"""
+    if created:
+        invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def drop_user_changes(sender, instance, **kwargs):
+    """Purge the change log of a deleted user, tombstones included"""
+    Change.objects.filter(user_id=instance.pk).delete()
@@ -0,0 +1,151 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections, router
+from django.db.models import (
+    BigIntegerField, BooleanField, ExpressionWrapper, Func, Q
+)
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from core.models import Change, Recipe
+
+DEFAULTS = {
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 1000,
+    'SETTLE_SECONDS': 5,
+}
+
+TOKEN_SALT = 'recipe.sync'
+
+
+def get_option(name):
+    """Return a DELTA_SYNC option, falling back to the default"""
+    return getattr(settings, 'DELTA_SYNC', {}).get(name, DEFAULTS[name])
+
+
+def record_changes(user_id, model, ids, deleted=False):
+    """Log the latest state of objects, replacing their earlier entries.
+
+    Every write path that bypasses model signals (queryset updates, bulk
+    inserts) must call this, or delta sync clients never see the change.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    label = model._meta.model_name
+    Change.objects.filter(
+        user_id=user_id, model=label, object_id__in=ids
+    ).delete()
+    txid = transaction_id()
+    Change.objects.bulk_create([
+        Change(user_id=user_id, model=label, object_id=pk, deleted=deleted,
+               txid=txid)
+        for pk in ids
+    ])
+
+
+def touch_recipes(queryset):
+    """Bump ``updated_at`` of the recipes in a queryset and log them.
+
+    Returns the ids of the recipes touched.
+    """
+    rows = list(queryset.values_list('id', 'user_id'))
+    if not rows:
+        return []
+    Recipe.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+        updated_at=timezone.now()
+    )
+    by_user = {}
+    for pk, user_id in rows:
+        by_user.setdefault(user_id, []).append(pk)
+    for user_id, ids in by_user.items():
+        record_changes(user_id, Recipe, ids)
+    return [pk for pk, _ in rows]
+
+
+def is_postgresql():
+    """Return whether the change log is stored in PostgreSQL"""
+    return connections[router.db_for_write(Change)].vendor == 'postgresql'
+
+
+def transaction_id():
+    """Return the value stored as the id of the transaction writing entries"""
+    if is_postgresql():
+        return Func(function='txid_current', output_field=BigIntegerField())
+    return 0
+
+
+def make_token(user_id, cursor):
+    """Return a signed sync token resuming after the given log position"""
+    return signing.dumps({'u': user_id, 'c': list(cursor)}, salt=TOKEN_SALT)
+
+
+def read_token(token, user_id):
+    """Return the ``(txid, id)`` log position of a token of the given user.
+
+    Raises ``signing.BadSignature`` for forged tokens or tokens of another
+    user. Tokens issued before entries carried a transaction id hold a
+    bare entry id.
+    """
+    data = signing.loads(token, salt=TOKEN_SALT)
+    cursor = data.get('c')
+    if isinstance(cursor, int):
+        cursor = [0, cursor]
+    if (data.get('u') != user_id or not isinstance(cursor, list)
+            or len(cursor) != 2
+            or not all(type(value) is int for value in cursor)):
+        raise signing.BadSignature('Sync token issued to another user')
+    return tuple(cursor)
+
+
+def settled():
+    """Return a condition matching log entries tokens may move past.
+
+    Entry ids are allocated before their transaction commits, so an entry
+    can become visible after later ones. On PostgreSQL entries are ordered
+    by the id of the transaction that wrote them, and only entries of
+    transactions older than the oldest one still running (the snapshot's
+    xmin) are final, however long a transaction takes to commit. Other
+    backends only treat entries older than ``SETTLE_SECONDS`` as final, so
+    there write transactions must commit within that window; SQLite
+    serializes writers, so it always holds.
+    """
+    if is_postgresql():
+        return Q(txid__lt=RawSQL(
+            'txid_snapshot_xmin(txid_current_snapshot())', []
+        ))
+    horizon = timezone.now() - timedelta(
+        seconds=get_option('SETTLE_SECONDS')
+    )
+    return Q(created_at__lte=horizon)
+
+
+def current_cursor(user_id):
+    """Return the log position a full snapshot is consistent with"""
+    position = Change.objects.filter(
+        settled(), user_id=user_id
+    ).order_by('-txid', '-id').values_list('txid', 'id').first()
+    return position or (0, 0)
+
+
+def read_changes(user_id, cursor, limit):
+    """Return ``(entries, next cursor, has more)`` after a log position"""
+    txid, last_id = cursor
+    entries = list(
+        Change.objects.filter(
+            Q(txid__gt=txid) | Q(txid=txid, id__gt=last_id),
+            user_id=user_id
+        ).annotate(
+            settled=ExpressionWrapper(settled(), output_field=BooleanField())
+        ).order_by('txid', 'id')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    for entry in entries:
+        if not entry.settled:
+            has_more = False
+            break
+        cursor = (entry.txid, entry.id)
+    return entries, cursor, has_more
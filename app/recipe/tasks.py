@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+
+from .images import get_option, process_recipe_image
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide image worker pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_option('WORKERS'),
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def run_image_job(recipe_id):
+    """Process one recipe image on a worker thread"""
+    try:
+        process_recipe_image(recipe_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_image(recipe_id):
+    """Schedule processing of a recipe's pending image.
+
+    In ``thread`` mode the job is submitted once the upload transaction
+    commits; ``sync`` processes it inline (used by tests). Pending rows
+    that never reach a worker, e.g. after a restart, are picked up by the
+    ``process_images`` management command.
+    """
+    if get_option('MODE') == 'sync':
+        process_recipe_image(recipe_id)
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_image_job, recipe_id)
+    )
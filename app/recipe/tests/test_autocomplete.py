@@ -0,0 +1,129 @@
+import difflib
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe import autocomplete
+from recipe.autocomplete import PrefixIndex
+
+TAGS_AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+INGREDIENTS_AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
+
+
+class PrefixIndexTests(TestCase):
+    """Test the in-memory prefix index"""
+
+    def setUp(self):
+        self.index = PrefixIndex([
+            (1, 'Red onion', 1),
+            (2, 'Onion', 5),
+            (3, 'Oregano', 0),
+            (4, 'Garlic', 2),
+        ])
+
+    def test_matches_start_of_any_word(self):
+        """Test prefixes match every word, most used first"""
+        self.assertEqual(
+            [row[0] for row in self.index.search('on', 10)], [2, 1]
+        )
+        self.assertEqual(
+            [row[0] for row in self.index.search('RED  On', 10)], [1]
+        )
+
+    def test_limit(self):
+        """Test only the top matches are returned"""
+        self.assertEqual(
+            [row[0] for row in self.index.search('o', 2)], [2, 1]
+        )
+
+    def test_fuzzy_fallback(self):
+        """Test a mistyped prefix still finds close names"""
+        self.assertEqual(
+            [row[0] for row in self.index.search('garlc', 10)], [4]
+        )
+        self.assertEqual(self.index.search('xyz', 10), [])
+
+    def test_fuzzy_compares_bounded_candidates(self):
+        """Test fuzzy lookups compare a capped number of keys"""
+        index = PrefixIndex(
+            [(i, f'Name{i:04d} spice', 0) for i in range(5000)]
+            + [(5000, 'Cardamom', 0)]
+        )
+        compare = difflib.SequenceMatcher.set_seq1
+        with mock.patch.object(difflib.SequenceMatcher, 'set_seq1',
+                               autospec=True,
+                               side_effect=compare) as compared:
+            rows = index.search('cardmom', 10)
+
+        self.assertEqual([row[0] for row in rows], [5000])
+        self.assertLessEqual(
+            compared.call_count, autocomplete.get_option('FUZZY_CANDIDATES')
+        )
+
+
+class AutocompleteApiTests(TestCase):
+    """Test the tag and ingredient autocomplete endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'complete@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.vegetarian = Tag.objects.create(
+            user=self.user, name='Vegetarian'
+        )
+        recipe = Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5, price=5
+        )
+        recipe.tags.add(self.vegetarian)
+
+    def test_login_required(self):
+        """Test autocomplete requires authentication"""
+        response = APIClient().get(TAGS_AUTOCOMPLETE_URL, {'q': 've'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ranked_by_usage(self):
+        """Test matches used by more recipes come first"""
+        response = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'veg'})
+
+        self.assertEqual(response.data, [
+            {'id': self.vegetarian.id, 'name': 'Vegetarian', 'uses': 1},
+            {'id': self.vegan.id, 'name': 'Vegan', 'uses': 0},
+        ])
+
+    def test_limited_to_user(self):
+        """Test other users' names are never suggested"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Ingredient.objects.create(user=other, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Sage')
+        response = self.client.get(
+            INGREDIENTS_AUTOCOMPLETE_URL, {'q': 's', 'limit': 5}
+        )
+
+        self.assertEqual([i['name'] for i in response.data], ['Sage'])
+
+    def test_cached_index_needs_no_queries(self):
+        """Test repeated keystrokes are answered from memory"""
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'v'})
+        with self.assertNumQueries(0):
+            response = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'vega'})
+
+        self.assertEqual([t['name'] for t in response.data], ['Vegan'])
+
+    def test_index_refreshes_after_changes(self):
+        """Test new names are suggested once created"""
+        self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'v'})
+        Tag.objects.create(user=self.user, name='Very spicy')
+        response = self.client.get(TAGS_AUTOCOMPLETE_URL, {'q': 'very'})
+
+        self.assertEqual([t['name'] for t in response.data], ['Very spicy'])
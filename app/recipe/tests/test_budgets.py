@@ -0,0 +1,293 @@
+import tempfile
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import resolve, reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from core.testing import BudgetTestMixin, get_budget
+from recipe.images import delete_image_files
+from recipe.urls import router
+from recipe.views import TagViewSet
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
+CHANGES_URL = reverse('recipe:changes')
+API_VIEW_URLS = (
+    CHANGES_URL,
+    reverse('user:create'),
+    reverse('user:token'),
+    reverse('user:me'),
+    reverse('performance'),
+)
+
+# Large enough that a query per row cannot hide inside a budget
+SIZES = (1, 50)
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class BudgetDeclarationTests(TestCase):
+    """Test every routed view declares its performance budgets"""
+
+    def test_viewset_actions_have_budgets(self):
+        """Test each action a viewset is routed for has a budget"""
+        for _, viewset, _ in router.registry:
+            for route in router.get_routes(viewset):
+                for action in route.mapping.values():
+                    if not hasattr(viewset, action):
+                        continue
+                    with self.subTest(viewset=viewset.__name__,
+                                      action=action):
+                        self.assertIn(action, viewset.performance_budgets)
+
+    def test_api_views_have_budgets(self):
+        """Test each method of the plain API views has a budget"""
+        for url in API_VIEW_URLS:
+            view_class = resolve(url).func.view_class
+            for method in ('get', 'post', 'put', 'patch', 'delete'):
+                if hasattr(view_class, method):
+                    with self.subTest(url=url, method=method):
+                        get_budget(method, url)
+
+    def test_missing_budget_fails(self):
+        """Test calls to an action without a budget are reported"""
+        with self.assertRaisesMessage(AssertionError, "'delete'"):
+            get_budget('delete', reverse('recipe:tag-list'))
+
+
+class RecipeBudgetTests(BudgetTestMixin, TestCase):
+    """Test the recipe endpoints stay in budget as the data grows"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'budgets@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Base', time_minutes=5, price=5
+        )
+
+    def _add_recipes(self, count):
+        """Create recipes that each have a tag and an ingredient"""
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5, price=5
+            )
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f't{count}-{i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'i{count}-{i}')
+            )
+
+    def _add_relations(self, count, prefix=''):
+        """Create tags and ingredients, linking them to the base recipe"""
+        self.tags = [
+            Tag.objects.create(
+                user=self.user, name=f'{prefix}tag {count}-{i}'
+            ).id for i in range(count)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(
+                user=self.user, name=f'{prefix}ing {count}-{i}'
+            ).id for i in range(count)
+        ]
+        self.recipe.tags.add(*self.tags)
+        self.recipe.ingredients.add(*self.ingredients)
+
+    def _add_linked_recipe(self, count):
+        """Create a recipe with ``count`` tags and ingredients"""
+        self.recipe = Recipe.objects.create(
+            user=self.user, title=f'Linked {count}', time_minutes=5, price=5
+        )
+        self._add_relations(count)
+
+    def test_list(self):
+        """Test listing recipes"""
+        self.assertBudgetAtSizes(self._add_recipes, 'get', RECIPE_URL, SIZES)
+
+    def test_retrieve(self):
+        """Test recipe detail"""
+        self.assertBudgetAtSizes(
+            self._add_relations, 'get', detail_url(self.recipe.id), SIZES
+        )
+
+    def test_create(self):
+        """Test creating a recipe linked to existing tags and ingredients"""
+        self.assertBudgetAtSizes(
+            self._add_relations, 'post', RECIPE_URL, SIZES,
+            data=lambda: {
+                'title': 'New', 'time_minutes': 5, 'price': '5.00',
+                'tags': self.tags, 'ingredients': self.ingredients,
+            },
+            format='json'
+        )
+
+    def test_update(self):
+        """Test replacing the fields and links of a recipe"""
+        def populate(count):
+            self._add_linked_recipe(count)
+            self._add_relations(count, prefix='new ')
+
+        self.assertBudgetAtSizes(
+            populate, 'put', lambda: detail_url(self.recipe.id), SIZES,
+            data=lambda: {
+                'title': 'Replaced', 'time_minutes': 5, 'price': '5.00',
+                'tags': self.tags, 'ingredients': self.ingredients,
+            },
+            format='json'
+        )
+
+    def test_partial_update(self):
+        """Test changing the title of a recipe with many links"""
+        self.assertBudgetAtSizes(
+            self._add_relations, 'patch', detail_url(self.recipe.id), SIZES,
+            data={'title': 'New'}
+        )
+
+    def test_destroy(self):
+        """Test deleting a recipe with many links"""
+        self.assertBudgetAtSizes(
+            self._add_linked_recipe, 'delete',
+            lambda: detail_url(self.recipe.id), SIZES
+        )
+
+    def test_bulk_update(self):
+        """Test patching every recipe of the library at once"""
+        self.assertBudgetAtSizes(
+            self._add_recipes, 'patch', RECIPES_BULK_URL, SIZES,
+            data=lambda: [
+                {'id': pk, 'time_minutes': 10}
+                for pk in Recipe.objects.values_list('id', flat=True)
+            ],
+            format='json'
+        )
+
+    def test_export(self):
+        """Test streaming the library"""
+        self.assertBudgetAtSizes(
+            self._add_recipes, 'get', EXPORT_URL, SIZES
+        )
+
+    def test_changes(self):
+        """Test a full sync snapshot"""
+        self.assertBudgetAtSizes(
+            self._add_recipes, 'get', CHANGES_URL, SIZES
+        )
+
+    @override_settings(IMAGE_PROCESSING={'MODE': 'sync'})
+    def test_upload_image(self):
+        """Test uploading an image to a recipe with many links"""
+        def upload():
+            ntf = tempfile.NamedTemporaryFile(suffix='.jpg')
+            self.addCleanup(ntf.close)
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            return {'image': ntf}
+
+        def cleanup():
+            self.recipe.refresh_from_db()
+            delete_image_files(self.recipe.image.storage,
+                               self.recipe.image.name)
+
+        self.addCleanup(cleanup)
+        self.assertBudgetAtSizes(
+            self._add_relations, 'post', image_upload_url(self.recipe.id),
+            SIZES, data=upload, format='multipart'
+        )
+
+
+class TagBudgetTests(BudgetTestMixin, TestCase):
+    """Test the tag endpoints stay in budget as the data grows"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'budgets@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _add_tags(self, count):
+        """Create tags each used by a recipe"""
+        recipe = Recipe.objects.create(
+            user=self.user, title=f'Recipe {count}', time_minutes=5, price=5
+        )
+        recipe.tags.add(*(
+            Tag.objects.create(user=self.user, name=f'Tag {count}-{i}')
+            for i in range(count)
+        ))
+
+    def test_list(self):
+        """Test listing tags"""
+        self.assertBudgetAtSizes(self._add_tags, 'get', TAGS_URL, SIZES)
+
+    def test_list_assigned_only(self):
+        """Test listing the tags in use"""
+        self.assertBudgetAtSizes(
+            self._add_tags, 'get', TAGS_URL, SIZES,
+            data={'assigned_only': 1}
+        )
+
+    def test_create(self):
+        """Test creating a tag in a large library"""
+        counter = iter(range(len(SIZES)))
+        self.assertBudgetAtSizes(
+            self._add_tags, 'post', TAGS_URL, SIZES,
+            data=lambda: {'name': f'New {next(counter)}'}
+        )
+
+    def test_bulk_update(self):
+        """Test renaming every tag at once"""
+        self.assertBudgetAtSizes(
+            self._add_tags, 'patch', TAGS_BULK_URL, SIZES,
+            data=lambda: [
+                {'id': pk, 'name': f'Renamed {pk}'}
+                for pk in Tag.objects.values_list('id', flat=True)
+            ],
+            format='json'
+        )
+
+    def test_autocomplete(self):
+        """Test completing a prefix shared by many tags"""
+        self.assertBudgetAtSizes(
+            self._add_tags, 'get', AUTOCOMPLETE_URL, SIZES,
+            data={'q': 'tag'}
+        )
+
+    def test_over_budget_fails(self):
+        """Test exceeding a query budget fails with the counts"""
+        budgets = {'list': {'queries': 0}}
+        with mock.patch.object(TagViewSet, 'performance_budgets', budgets), \
+                self.assertRaisesMessage(AssertionError, 'budget 0'):
+            self.assertWithinBudget('get', TAGS_URL)
+
+    def test_time_budgets_opt_in(self):
+        """Test latency budgets are only checked with a time factor"""
+        budgets = {'list': {'queries': 10, 'ms': 0}}
+        with mock.patch.object(TagViewSet, 'performance_budgets', budgets):
+            with self.settings(PERFORMANCE_BUDGETS={}):
+                self.assertWithinBudget('get', TAGS_URL)
+            with self.settings(PERFORMANCE_BUDGETS={'TIME_FACTOR': 1}), \
+                    self.assertRaisesMessage(AssertionError, 'budget 0 ms'):
+                self.assertWithinBudget('get', TAGS_URL)
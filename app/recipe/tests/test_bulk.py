@@ -0,0 +1,213 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Ingredient, Recipe, Tag
+
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENTS_BULK_URL = reverse('recipe:ingredient-bulk')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def recipe_payload(title, **extra):
+    """Return the payload of a new recipe"""
+    return {'title': title, 'time_minutes': 10, 'price': '4.00', **extra}
+
+
+class BulkRecipeTests(TestCase):
+    """Test the bulk recipe endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+
+    def test_bulk_create(self):
+        """Test creating many recipes with their relations at once"""
+        payload = [
+            recipe_payload(
+                'Soup', tags=[self.tag.id], ingredients=[self.ingredient.id]
+            ),
+            recipe_payload('Stew'),
+        ]
+        response = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['title'] for r in response.data],
+                         ['Soup', 'Stew'])
+        soup = Recipe.objects.get(title='Soup')
+        self.assertEqual(list(soup.tags.all()), [self.tag])
+        self.assertEqual(list(soup.ingredients.all()), [self.ingredient])
+        self.assertEqual(response.data[0]['tags'], [self.tag.id])
+        self.assertEqual(
+            Change.objects.filter(model='recipe').count(), 2
+        )
+
+    def test_relation_lookup_does_not_scale(self):
+        """Test related ids are resolved once for the whole batch"""
+        def post(count):
+            payload = [
+                recipe_payload(f'R{i}', tags=[self.tag.id])
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(RECIPES_BULK_URL, payload, format='json')
+            return [q['sql'] for q in ctx.captured_queries
+                    if 'FROM "core_tag"' in q['sql']
+                    and 'core_recipe' not in q['sql']]
+
+        self.assertEqual(len(post(1)), len(post(20)))
+
+    def test_errors_are_reported_per_item(self):
+        """Test a bad item aborts the batch and is reported by position"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        foreign = Tag.objects.create(user=other, name='Foreign')
+        payload = [
+            recipe_payload('Good'),
+            recipe_payload('Bad', tags=[foreign.id]),
+            {'title': 'Incomplete'},
+        ]
+        response = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('tags', response.data[1])
+        self.assertIn('time_minutes', response.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        """Test patching fields and relations of many recipes"""
+        soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+        stew = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5, price=5
+        )
+        soup.tags.add(self.tag)
+        payload = [
+            {'id': soup.id, 'tags': []},
+            {'id': stew.id, 'title': 'Beef stew',
+             'ingredients': [self.ingredient.id]},
+        ]
+        response = self.client.patch(
+            RECIPES_BULK_URL, payload, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        soup.refresh_from_db()
+        stew.refresh_from_db()
+        self.assertEqual(soup.title, 'Soup')
+        self.assertEqual(soup.tags.count(), 0)
+        self.assertEqual(stew.title, 'Beef stew')
+        self.assertEqual(list(stew.ingredients.all()), [self.ingredient])
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'],
+                         'Beef stew')
+
+    def test_bulk_update_unknown_id(self):
+        """Test updates of missing or foreign recipes are rejected"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        foreign = Recipe.objects.create(
+            user=other, title='Theirs', time_minutes=5, price=5
+        )
+        response = self.client.patch(
+            RECIPES_BULK_URL,
+            [{'id': foreign.id, 'title': 'Mine'}, {'title': 'No id'}],
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0]['id'], ['Not found.'])
+        self.assertEqual(response.data[1]['id'], ['This field is required.'])
+
+    def test_bulk_delete(self):
+        """Test deleting many recipes leaves tombstones"""
+        ids = [
+            Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5, price=5
+            ).id
+            for i in range(3)
+        ]
+        response = self.client.delete(
+            RECIPES_BULK_URL, {'ids': ids[:2]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)), ids[2:]
+        )
+        self.assertEqual(
+            Change.objects.filter(model='recipe', deleted=True).count(), 2
+        )
+
+    def test_payload_must_be_a_list(self):
+        """Test non list payloads and oversized batches are rejected"""
+        response = self.client.post(
+            RECIPES_BULK_URL, recipe_payload('Soup'), format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkAttributeTests(TestCase):
+    """Test the bulk tag and ingredient endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_and_rename_tags(self):
+        """Test tags can be created and renamed in batches"""
+        response = self.client.post(
+            TAGS_BULK_URL, [{'name': 'Vegan'}, {'name': 'Quick'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        vegan = Tag.objects.get(name='Vegan')
+
+        response = self.client.patch(
+            TAGS_BULK_URL, [{'id': vegan.id, 'name': 'Plant based'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': vegan.id, 'name': 'Plant based'}
+        ])
+
+    def test_bulk_delete_ingredients(self):
+        """Test unknown ids abort a bulk delete"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        response = self.client.delete(
+            INGREDIENTS_BULK_URL, {'ids': [salt.id, salt.id + 100]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[1], {'id': ['Not found.']})
+        self.assertTrue(Ingredient.objects.exists())
+
+    def test_bulk_delete_rejects_booleans(self):
+        """Test true is not taken as the id 1"""
+        salt = Ingredient.objects.create(pk=1, user=self.user, name='Salt')
+        response = self.client.delete(
+            INGREDIENTS_BULK_URL, {'ids': [True]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Ingredient.objects.filter(pk=salt.pk).exists())
@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified revalidation of the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(self.tag)
+
+    def revalidate(self, url, etag, **params):
+        """Repeat a GET with the ETag of an earlier response"""
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_list_not_modified(self):
+        """Test revalidating an unchanged list answers 304 without a body"""
+        for url in (RECIPE_URL, TAGS_URL, INGREDIENTS_URL):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(1):
+                response = self.revalidate(url, etag)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_304_NOT_MODIFIED
+            )
+            self.assertEqual(response.content, b'')
+            self.assertEqual(response['ETag'], etag)
+
+    def test_cached_list_not_modified_without_queries(self):
+        """Test a response cache hit revalidates without the database"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        with self.assertNumQueries(0):
+            response = self.revalidate(RECIPE_URL, etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_on_edit_and_delete(self):
+        """Test edits and deletions invalidate the list ETag"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.title = 'Stew'
+        self.recipe.save()
+        response = self.revalidate(RECIPE_URL, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        self.recipe.delete()
+        response = self.revalidate(RECIPE_URL, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    def test_list_etag_depends_on_query(self):
+        """Test filtered and paginated lists carry their own ETag"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        response = self.revalidate(RECIPE_URL, etag, tags=str(self.tag.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_expanded_list_tracks_renames(self):
+        """Test renaming an expanded tag changes the list ETag"""
+        etag = self.client.get(RECIPE_URL, {'expand': 'tags'})['ETag']
+        self.client.patch(
+            TAGS_BULK_URL, [{'id': self.tag.id, 'name': 'Vegetal'}],
+            format='json'
+        )
+        response = self.revalidate(RECIPE_URL, etag, expand='tags')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data[0]['tags'][0]['name'], 'Vegetal'
+        )
+
+    def test_assigned_only_tracks_recipe_links(self):
+        """Test moving a recipe to another tag changes assigned tags"""
+        other = Tag.objects.create(user=self.user, name='Quick')
+        etag = self.client.get(TAGS_URL, {'assigned_only': 1})['ETag']
+        self.recipe.tags.remove(self.tag)
+        self.recipe.tags.add(other)
+        response = self.revalidate(TAGS_URL, etag, assigned_only=1)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in response.data], ['Quick'])
+
+    def test_detail_not_modified(self):
+        """Test revalidating a recipe by ETag or by date"""
+        response = self.client.get(detail_url(self.recipe.id))
+        self.assertIn('Last-Modified', response)
+
+        etag_check = self.revalidate(
+            detail_url(self.recipe.id), response['ETag']
+        )
+        date_check = self.client.get(
+            detail_url(self.recipe.id),
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(etag_check.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(date_check.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_tracks_nested_objects(self):
+        """Test relation edits, renames and deletions change the detail ETag"""
+        url = detail_url(self.recipe.id)
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        def rename_tag():
+            self.tag.name = 'Vegetal'
+            self.tag.save()
+
+        changes = [
+            lambda: self.recipe.ingredients.add(ingredient),
+            rename_tag,
+            ingredient.delete,
+        ]
+        for change in changes:
+            etag = self.client.get(url)['ETag']
+            change()
+            self.assertEqual(
+                self.revalidate(url, etag).status_code, status.HTTP_200_OK
+            )
+
+    def test_detail_of_other_user_is_not_found(self):
+        """Test validators never leak the state of another user's recipe"""
+        other = get_user_model().objects.create_user('other@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=other, title='Secret', time_minutes=5, price=5
+        )
+        response = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
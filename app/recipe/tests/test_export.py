@@ -0,0 +1,102 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.export import iter_records
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class ExportTests(TestCase):
+    """Test the streaming recipe export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'export@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.soup = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price='4.50'
+        )
+        self.soup.tags.add(
+            Tag.objects.create(user=self.user, name='Vegan'),
+            Tag.objects.create(user=self.user, name='Quick'),
+        )
+        self.soup.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Leek')
+        )
+        self.stew = Recipe.objects.create(
+            user=self.user, title='Stew, "hearty"', time_minutes=90, price=9
+        )
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        Recipe.objects.create(user=other, title='Theirs', time_minutes=5,
+                              price=5)
+
+    def test_ndjson_export(self):
+        """Test every recipe of the user is streamed as one JSON line"""
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r['title'] for r in records],
+                         ['Soup', 'Stew, "hearty"'])
+        self.assertEqual(records[0]['tags'], ['Quick', 'Vegan'])
+        self.assertEqual(records[0]['ingredients'], ['Leek'])
+        self.assertEqual(records[0]['price'], '4.50')
+
+    def test_csv_export(self):
+        """Test the CSV export quotes values and encodes name lists"""
+        response = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(rows[1]['title'], 'Stew, "hearty"')
+        self.assertEqual(json.loads(rows[0]['tags']), ['Quick', 'Vegan'])
+        self.assertEqual(rows[1]['ingredients'], '[]')
+
+    def test_unknown_type(self):
+        """Test unsupported export types are rejected"""
+        response = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_relations_read_per_chunk(self):
+        """Test names are fetched once per chunk, not once per recipe"""
+        for i in range(8):
+            Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5, price=5
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            records = list(iter_records(self.user.pk, chunk_size=4))
+
+        self.assertEqual(len(records), 10)
+        # 3 chunks of recipes, each with one query per relation
+        self.assertEqual(len(ctx.captured_queries), 1 + 3 * 2)
+
+    def test_command(self):
+        """Test the management command writes the export"""
+        out = StringIO()
+        call_command('export_recipes', 'export@test.com', type='csv',
+                     stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        with self.assertRaises(CommandError):
+            call_command('export_recipes', 'nobody@test.com', stdout=out)
@@ -0,0 +1,78 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class FastListTests(TestCase):
+    """Test the values() list fast path renders what the serializer does"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'fast@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ['Vegan', 'Quick', 'Cheap']]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Soup {i}', time_minutes=i,
+                price='%d.5' % i, link='https://example.com' if i else ''
+            )
+            recipe.tags.add(*tags[i % 3:])
+            if i % 2:
+                recipe.ingredients.add(salt)
+        recipe.image = 'uploads/recipe/ab/cd.jpg'
+        recipe.image_status = Recipe.IMAGE_READY
+        recipe.save()
+
+    def _compare(self, url, params=None):
+        """Assert both paths return the same bytes and return them"""
+        with override_settings(FAST_LIST={'ENABLED': False}):
+            slow = self.client.get(url, params)
+        with override_settings(FAST_LIST={'ENABLED': True}):
+            fast = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_list_matches_serializer(self):
+        """Test the recipe list is byte for byte identical"""
+        response = self._compare(RECIPE_URL)
+
+        self.assertEqual(len(response.data), 5)
+        self.assertIsNotNone(response.data[0]['images'])
+
+    def test_filtered_and_searched_lists_match(self):
+        """Test filters and search ordering go through the fast path"""
+        tag = Tag.objects.get(name='Cheap')
+        self._compare(RECIPE_URL, {'tags': str(tag.id)})
+        self._compare(RECIPE_URL, {'search': 'soup'})
+
+    def test_paginated_lists_match(self):
+        """Test every page and its links are identical"""
+        response = self._compare(RECIPE_URL, {'page_size': 2})
+        while response.data['next']:
+            response = self._compare(response.data['next'])
+
+    def test_tag_list_matches(self):
+        """Test the tag list is identical too"""
+        self._compare(TAGS_URL)
+        self._compare(TAGS_URL, {'assigned_only': 1})
+
+    @override_settings(FAST_LIST={'ENABLED': True})
+    def test_queries_constant(self):
+        """Test the fast path reads each relation once for the whole list"""
+        with self.assertNumQueries(4):
+            self.client.get(RECIPE_URL)
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.images import VARIANTS, delete_image_files, variant_name
+
+
+def variant_url(name, variant, ext='jpg'):
+    """Return the lazy variant URL of an image"""
+    return reverse(
+        'recipe:image-variant',
+        kwargs={'name': name, 'variant': variant, 'ext': ext}
+    )
+
+
+@override_settings(IMAGE_PROCESSING={'MODE': 'sync'})
+class ImageVariantTests(TestCase):
+    """Test responsive image variants"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'variants@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Toast', time_minutes=5, price=5
+        )
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (1400, 700)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(
+                reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+                {'image': ntf},
+                format='multipart'
+            )
+        self.recipe.refresh_from_db()
+        self.storage = self.recipe.image.storage
+
+    def tearDown(self):
+        delete_image_files(self.storage, self.recipe.image.name)
+
+    def test_detail_exposes_size_map(self):
+        """Test the recipe serializer returns a URL per variant"""
+        response = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        images = response.data['images']
+        self.assertTrue(images['original'].endswith(self.recipe.image.url))
+        self.assertEqual(
+            set(images) - {'original', 'webp'}, set(VARIANTS)
+        )
+        self.assertEqual(set(images['webp']), set(VARIANTS))
+
+    def test_variant_generated_on_first_request(self):
+        """Test a missing variant is created and cached on disk"""
+        name = variant_name(self.recipe.image.name, 'medium', 'webp')
+        self.assertFalse(self.storage.exists(name))
+
+        response = self.client.get(
+            variant_url(self.recipe.image.name, 'medium', 'webp')
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertTrue(self.storage.exists(name))
+        with Image.open(self.storage.path(name)) as image:
+            self.assertEqual(max(image.size), VARIANTS['medium'])
+
+    def test_unknown_image_not_served(self):
+        """Test variants are only generated for recipe images"""
+        response = self.client.get(
+            variant_url('uploads/recipe/missing.jpg', 'medium')
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prune_evicts_stale_variants(self):
+        """Test pruning removes old lazy variants but keeps eager ones"""
+        self.client.get(variant_url(self.recipe.image.name, 'large'))
+        large = self.storage.path(
+            variant_name(self.recipe.image.name, 'large')
+        )
+        old = time.time() - 40 * 86400
+        os.utime(large, (old, old))
+
+        call_command(
+            'prune_image_variants', '--max-age-days', '30', stdout=StringIO()
+        )
+
+        self.assertFalse(os.path.exists(large))
+        self.assertTrue(self.storage.exists(
+            variant_name(self.recipe.image.name, 'thumbnail')
+        ))
+        self.assertTrue(self.storage.exists(self.recipe.image.name))
@@ -0,0 +1,119 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import MagicMock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Change, Ingredient, Recipe, Tag
+from recipe.export import export_stream
+from recipe.importer import RecipeImporter, copy_rows, read_records
+
+
+class ImportTests(TestCase):
+    """Test the bulk recipe importer"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'import@test.com',
+            'testpass'
+        )
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+
+    def _import(self, text, import_type='ndjson', batch_size=2):
+        """Run the importer over a text and return it"""
+        importer = RecipeImporter(self.user, batch_size)
+        importer.run(read_records(StringIO(text), import_type))
+        return importer
+
+    def test_import_ndjson(self):
+        """Test recipes are created with their tags and ingredients"""
+        importer = self._import(
+            '{"title": "Soup", "time_minutes": 5, "price": "4.50",'
+            ' "tags": ["vegan", "Quick"], "ingredients": ["Leek"]}\n'
+            '\n'
+            '{"title": "Stew", "time_minutes": "90", "price": 9,'
+            ' "tags": ["QUICK"]}\n'
+            '{"title": "Salad", "time_minutes": 5, "price": 3}\n'
+        )
+
+        self.assertEqual(importer.imported, 3)
+        self.assertEqual(importer.errors, [])
+        soup = Recipe.objects.get(title='Soup')
+        self.assertEqual(
+            sorted(tag.name for tag in soup.tags.all()), ['Quick', 'Vegan']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            list(Recipe.objects.get(title='Stew').tags.all()),
+            [Tag.objects.get(name='Quick')]
+        )
+        self.assertEqual(
+            Change.objects.filter(model='recipe').count(), 3
+        )
+
+    def test_invalid_records_skipped(self):
+        """Test invalid lines are reported with their line number"""
+        importer = self._import(
+            '{"title": "Soup", "time_minutes": 5, "price": 4}\n'
+            '{"title": "No price", "time_minutes": 5}\n'
+            'not json\n'
+            '{"title": "Bad tags", "time_minutes": 5, "price": 4,'
+            ' "tags": "Vegan"}\n'
+        )
+
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([line for line, _ in importer.errors], [2, 3, 4])
+        self.assertIn('price', importer.errors[0][1])
+
+    def test_export_round_trip(self):
+        """Test a CSV export imports into another library"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        recipe = Recipe.objects.create(
+            user=other, title='Stew, "hearty"', time_minutes=90, price=9
+        )
+        recipe.ingredients.add(Ingredient.objects.create(user=other,
+                                                         name='Beef'))
+        recipe.tags.add(Tag.objects.create(user=other, name='Vegan'))
+        text = b''.join(export_stream(other.pk, 'csv')).decode()
+
+        importer = self._import(text, 'csv')
+
+        self.assertEqual(importer.imported, 1)
+        imported = Recipe.objects.get(user=self.user)
+        self.assertEqual(imported.title, 'Stew, "hearty"')
+        self.assertEqual(list(imported.tags.all()), [self.vegan])
+        self.assertEqual(imported.ingredients.get().name, 'Beef')
+
+    def test_copy_rows(self):
+        """Test COPY input keeps empty strings apart from NULL"""
+        cursor = MagicMock()
+        cursor.db = connection
+        copy_rows(cursor, 'core_recipe', ['id', 'link'], [[1, ''], [2, 'x']])
+
+        sql, buffer = cursor.copy_expert.call_args[0]
+        self.assertEqual(
+            sql, 'COPY "core_recipe" ("id", "link") FROM STDIN WITH '
+                 '(FORMAT csv)'
+        )
+        self.assertEqual(buffer.read(), '1,""\r\n2,"x"\r\n')
+
+    def test_command(self):
+        """Test the command imports a file and reports its throughput"""
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.ndjson', delete=False
+        ) as f:
+            f.write('{"title": "Soup", "time_minutes": 5, "price": 4}\n')
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_recipes', 'import@test.com', f.name, stdout=out)
+
+        self.assertIn('Imported 1 recipes', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'nobody@test.com', f.name,
+                         stdout=out)
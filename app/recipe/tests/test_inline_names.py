@@ -0,0 +1,168 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+
+
+def detail_url(recipe_id):
+    """Return the recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def recipe_payload(title, **extra):
+    """Return the payload of a new recipe"""
+    return {'title': title, 'time_minutes': 10, 'price': '4.00',
+            'tags': [], 'ingredients': [], **extra}
+
+
+class InlineNameTests(TestCase):
+    """Test tags and ingredients given by name in recipe payloads"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'names@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_create_with_ids_and_names(self):
+        """Test new names are created and existing ones reused"""
+        response = self.client.post(RECIPE_URL, recipe_payload(
+            'Soup',
+            tags=[self.vegan.id, 'Quick', 'vegan'],
+            ingredients=['Salt', 'Leek']
+        ), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=response.data['id'])
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()), ['Quick', 'Vegan']
+        )
+        self.assertEqual(
+            sorted(i.name for i in recipe.ingredients.all()), ['Leek', 'Salt']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(sorted(response.data['tags']),
+                         sorted(tag.id for tag in recipe.tags.all()))
+
+    def test_names_are_scoped_to_user(self):
+        """Test another user's tag of the same name is not reused"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        theirs = Tag.objects.create(user=other, name='Quick')
+        self.client.post(
+            RECIPE_URL, recipe_payload('Soup', tags=['quick']), format='json'
+        )
+
+        tag = Tag.objects.get(user=self.user, name='quick')
+        self.assertNotEqual(tag.id, theirs.id)
+
+    def test_foreign_ids_rejected(self):
+        """Test ids of another user's objects are rejected"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        theirs = Tag.objects.create(user=other, name='Theirs')
+        response = self.client.post(
+            RECIPE_URL, recipe_payload('Soup', tags=[theirs.id, 'New']),
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.data)
+        self.assertFalse(Tag.objects.filter(name='New').exists())
+
+    def test_update_with_names(self):
+        """Test a patch can replace tags with new names"""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+        recipe.tags.add(self.vegan)
+        response = self.client.patch(
+            detail_url(recipe.id), {'tags': ['Spicy']}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag.name for tag in recipe.tags.all()], ['Spicy']
+        )
+
+    def test_lookup_does_not_scale(self):
+        """Test names are resolved with one lookup however many are given"""
+        def post(title, count):
+            names = [f'{title} {i}' for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(
+                    RECIPE_URL, recipe_payload(title, tags=names),
+                    format='json'
+                )
+            return [q['sql'] for q in ctx.captured_queries
+                    if q['sql'].startswith('SELECT')
+                    and 'FROM "core_tag"' in q['sql']]
+
+        self.assertEqual(len(post('One', 1)), len(post('Many', 20)))
+
+    @skipUnless(connection.features.can_return_rows_from_bulk_insert,
+                'needs multi-row INSERT ... RETURNING')
+    def test_query_count_does_not_scale(self):
+        """Test the whole create takes the same queries for any name count"""
+        def post(title, count):
+            names = [f'{title} {i}' for i in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(
+                    RECIPE_URL, recipe_payload(title, tags=names),
+                    format='json'
+                )
+            return len(ctx.captured_queries)
+
+        self.assertEqual(post('One', 1), post('Many', 20))
+
+
+class UniqueNameTests(TestCase):
+    """Test tag and ingredient names are unique per user, ignoring case"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'unique@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    def test_constraint(self):
+        """Test the database rejects a name differing only in case"""
+        with self.assertRaises(IntegrityError):
+            Ingredient.objects.create(user=self.user, name='Salt')
+            Ingredient.objects.create(user=self.user, name='SALT')
+
+    def test_create_duplicate_rejected(self):
+        """Test creating a tag with a taken name fails"""
+        response = self.client.post(TAGS_URL, {'name': 'VEGAN'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+
+    def test_bulk_duplicates_rejected(self):
+        """Test bulk writes report repeated and taken names by position"""
+        response = self.client.post(TAGS_BULK_URL, [
+            {'name': 'Quick'}, {'name': 'vegan'}, {'name': 'QUICK'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {'name': ['Duplicate name.']})
+        self.assertEqual(
+            response.data[1], {'name': ['This name is already used.']}
+        )
+        self.assertEqual(Tag.objects.count(), 1)
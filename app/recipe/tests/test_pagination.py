@@ -0,0 +1,111 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination on the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'pages@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url):
+        """Follow next links and return every page of results"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data['results'])
+            url = response.data['next']
+        return pages
+
+    def test_unpaginated_by_default(self):
+        """Test lists stay plain arrays without pagination params"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        response = self.client.get(TAGS_URL)
+
+        self.assertIsInstance(response.data, list)
+
+    def test_recipes_paginated_by_id(self):
+        """Test paging through recipes newest first"""
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5, price=5
+            )
+            for i in range(5)
+        ]
+        pages = self._walk(f'{RECIPE_URL}?page_size=2')
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [row['id'] for page in pages for row in page]
+        self.assertEqual(ids, [r.id for r in reversed(recipes)])
+
+    def test_ties_broken_by_id(self):
+        """Test ties on the ordering key are broken by id"""
+        recipes = [
+            Recipe.objects.create(
+                user=self.user, title=title, time_minutes=5, price=5
+            )
+            for title in ['Soup', 'Bean soup', 'Soup', 'Stew', 'Soup']
+        ]
+        pages = self._walk(f'{RECIPE_URL}?search=soup&page_size=2')
+
+        rows = [row for page in pages for row in page]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [recipe.id for recipe in reversed(recipes)
+             if 'oup' in recipe.title]
+        )
+
+    def test_previous_link(self):
+        """Test the previous link returns the earlier page"""
+        for i in range(4):
+            Tag.objects.create(user=self.user, name=f'tag{i}')
+        first = self.client.get(f'{TAGS_URL}?page_size=2')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+        self.assertEqual(back.data['next'], first.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns 404"""
+        response = self.client.get(f'{TAGS_URL}?cursor=notacursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_checked(self):
+        """Test cursor values of the wrong type return 404, not 500"""
+        for url, params, position in (
+            (RECIPE_URL, {}, ['abc']),
+            (RECIPE_URL, {}, [None]),
+            (RECIPE_URL, {}, [[1]]),
+            (RECIPE_URL, {'search': 'soup'}, ['high', 1]),
+            (TAGS_URL, {}, ['Vegan', 'x']),
+        ):
+            params['cursor'] = base64.urlsafe_b64encode(
+                json.dumps({'p': position}).encode()
+            ).decode()
+            with self.subTest(url=url, position=position):
+                response = self.client.get(url, params)
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
@@ -0,0 +1,166 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from core.testing import BudgetTestMixin
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeQueryCountTests(BudgetTestMixin, TestCase):
+    """Test the recipe endpoints run a constant number of queries"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'queries@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Base', time_minutes=5, price=5
+        )
+
+    def _add_recipes(self, count):
+        """Create recipes that each have a tag and an ingredient"""
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5, price=5
+            )
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f't{count}-{i}')
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'i{count}-{i}')
+            )
+
+    def _add_relations(self, count):
+        """Attach more tags and ingredients to the base recipe"""
+        for i in range(count):
+            self.recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {count}-{i}')
+            )
+            self.recipe.ingredients.add(Ingredient.objects.create(
+                user=self.user, name=f'ing {count}-{i}'
+            ))
+
+    def test_list_queries_constant(self):
+        """Test listing recipes does not issue queries per recipe"""
+        count = self.assertConstantQueries(
+            self._add_recipes,
+            lambda: self.count_queries('get', RECIPE_URL),
+        )
+        # ETag aggregate, recipes, tag ids, ingredient ids
+        self.assertLessEqual(count, 4)
+
+    def test_retrieve_queries_constant(self):
+        """Test recipe detail does not issue queries per relation"""
+        count = self.assertConstantQueries(
+            self._add_relations,
+            lambda: self.count_queries('get', detail_url(self.recipe.id)),
+        )
+        # ETag aggregate, recipe, tags, ingredients
+        self.assertLessEqual(count, 4)
+
+    def test_partial_update_queries_constant(self):
+        """Test updating a title does not scale with relation count"""
+        self.assertConstantQueries(
+            self._add_relations,
+            lambda: self.count_queries(
+                'patch', detail_url(self.recipe.id), data={'title': 'New'}
+            ),
+        )
+
+    def _relation_writes(self, method, data):
+        """Send an update and return its writes to the through tables"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(
+                detail_url(self.recipe.id), data, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith(('INSERT', 'DELETE'))
+                and ('"core_recipe_tags"' in q['sql']
+                     or '"core_recipe_ingredients"' in q['sql'])]
+
+    def test_update_without_relations_skips_links(self):
+        """Test a title change leaves 40 ingredient links untouched"""
+        self._add_relations(40)
+
+        self.assertEqual(self._relation_writes('patch', {'title': 'New'}), [])
+
+    def test_update_with_same_relations_skips_links(self):
+        """Test resending the current relations writes nothing"""
+        self._add_relations(3)
+        data = {
+            'tags': list(self.recipe.tags.values_list('id', flat=True)),
+            'ingredients': list(
+                self.recipe.ingredients.values_list('id', flat=True)
+            ),
+        }
+
+        self.assertEqual(self._relation_writes('patch', data), [])
+
+    def test_update_writes_only_the_difference(self):
+        """Test one removed and one added tag take one DELETE and INSERT"""
+        self._add_relations(3)
+        tags = list(self.recipe.tags.values_list('id', flat=True))
+        extra = Tag.objects.create(user=self.user, name='Extra')
+        writes = self._relation_writes(
+            'patch', {'tags': tags[1:] + [extra.id]}
+        )
+
+        self.assertEqual(len(writes), 2)
+        self.assertEqual(
+            set(self.recipe.tags.values_list('id', flat=True)),
+            set(tags[1:] + [extra.id])
+        )
+        self.assertEqual(self.recipe.ingredients.count(), 3)
+
+    def test_replacing_relations_queries_constant(self):
+        """Test replacing every link does not scale with their count"""
+        def populate(count):
+            self._add_relations(count)
+            self.replacement = [
+                Tag.objects.create(user=self.user, name=f'new {count}-{i}').id
+                for i in range(count)
+            ]
+
+        self.assertConstantQueries(
+            populate,
+            lambda: self.count_queries(
+                'patch', detail_url(self.recipe.id),
+                data={'tags': self.replacement}, format='json'
+            ),
+        )
+
+    def test_put_without_relations_rejected(self):
+        """Test a full update must still send the relations"""
+        self._add_relations(2)
+        response = self.client.put(detail_url(self.recipe.id), {
+            'title': 'Plain', 'time_minutes': 5, 'price': '5.00'
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'tags', 'ingredients'})
+        self.assertEqual(self.recipe.tags.count(), 2)
+
+    def test_list_returns_related_ids(self):
+        """Test the prefetched list still renders related ids"""
+        self._add_relations(2)
+        response = self.client.get(RECIPE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data[0]['tags']), 2)
+        self.assertEqual(len(response.data[0]['ingredients']), 2)
@@ -1,11 +1,17 @@
 import os
+import tempfile
+from io import StringIO
+
+from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from core.models import Recipe,Tag,Ingredient
+from ..images import VARIANTS, delete_image_files, variant_name
 from ..serializers import RecipeSerializer,RecipeDetailSerializer
 
 RECIPE_URL = reverse('recipe:recipe-list')
@@ -185,7 +191,48 @@ class PrivateRecipeAPITest(TestCase):
         tags = recipe.tags.all()
         self.assertEqual(len(tags),0)
 
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all only returns recipes carrying every tag"""
+        tag1 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Quick')
+        both = sample_recipe(user=self.user, title='Salad')
+        both.tags.add(tag1, tag2)
+        one = sample_recipe(user=self.user, title='Stew')
+        one.tags.add(tag1)
+
+        response = self.client.get(
+            RECIPE_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in response.data], [both.id])
+
+    def test_filter_recipes_by_tags_and_ingredients(self):
+        """Test tag and ingredient filters are combined"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+        match = sample_recipe(user=self.user, title='Curry')
+        match.tags.add(tag)
+        match.ingredients.add(ingredient)
+        tagged_only = sample_recipe(user=self.user, title='Rice')
+        tagged_only.tags.add(tag)
+
+        response = self.client.get(
+            RECIPE_URL,
+            {'tags': str(tag.id), 'ingredients': str(ingredient.id)}
+        )
+
+        self.assertEqual([r['id'] for r in response.data], [match.id])
+
+    def test_filter_recipes_invalid_ids(self):
+        """Test non numeric filter ids are rejected"""
+        response = self.client.get(RECIPE_URL, {'tags': '1,abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
+@override_settings(IMAGE_PROCESSING={'MODE': 'sync'})
 class RecipeImageUploadTests(TestCase):
 
     def setUp(self):
@@ -198,7 +245,19 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
-        self.recipe.image.delete()
+        self.recipe.refresh_from_db()
+        delete_image_files(self.recipe.image.storage, self.recipe.image.name)
+
+    def _upload(self, image, **save_kwargs):
+        """Post a PIL image to the recipe upload endpoint"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            image.save(ntf, format='JPEG', **save_kwargs)
+            ntf.seek(0)
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': ntf},
+                format='multipart'
+            )
 
     def test_upload_image_to_recipe(self):
         """Test uploading an email to recipe"""
@@ -210,9 +269,53 @@ class RecipeImageUploadTests(TestCase):
             res = self.client.post(url, {'image': ntf}, format='multipart')
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+
+    def test_upload_generates_eager_variants(self):
+        """Test processing writes the eager variants in every format"""
+        self._upload(Image.new('RGB', (1600, 800)))
+
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        for ext in ('jpg', 'webp'):
+            path = storage.path(
+                variant_name(self.recipe.image.name, 'thumbnail', ext)
+            )
+            with Image.open(path) as resized:
+                self.assertEqual(max(resized.size), VARIANTS['thumbnail'])
+        self.assertFalse(storage.exists(
+            variant_name(self.recipe.image.name, 'large')
+        ))
+
+    def test_upload_strips_metadata(self):
+        """Test EXIF metadata is not kept on the processed image"""
+        exif = Image.Exif()
+        exif[0x010f] = 'PhoneMaker'
+        self._upload(Image.new('RGB', (20, 20)), exif=exif)
+
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as processed:
+            self.assertEqual(len(processed.getexif()), 0)
+
+    @override_settings(IMAGE_PROCESSING={'MODE': 'thread'})
+    def test_upload_returns_before_processing(self):
+        """Test the upload is queued rather than processed inline"""
+        res = self._upload(Image.new('RGB', (10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+
+    @override_settings(IMAGE_PROCESSING={'MODE': 'thread'})
+    def test_process_images_command(self):
+        """Test the command drains images left pending"""
+        self._upload(Image.new('RGB', (10, 10)))
+        call_command('process_images', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
 
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class ResponseCacheTests(TestCase):
+    """Test the per-user list response cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5
+        )
+
+    def test_hit_needs_no_queries(self):
+        """Test a repeated list call is served without the database"""
+        first = self.client.get(RECIPE_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(second.data, first.data)
+
+    def test_query_string_is_part_of_key(self):
+        """Test different filters are cached separately"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        response = self.client.get(RECIPE_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(response.data, [])
+
+    def test_save_invalidates(self):
+        """Test creating or editing an object refreshes the lists"""
+        self.client.get(TAGS_URL)
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(INGREDIENTS_URL)
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        self.assertEqual(len(self.client.get(TAGS_URL).data), 1)
+        self.assertEqual(
+            self.client.get(INGREDIENTS_URL).data[0]['id'], ingredient.id
+        )
+
+    def test_delete_invalidates(self):
+        """Test deleting a recipe refreshes the recipe list"""
+        self.client.get(RECIPE_URL)
+        self.recipe.delete()
+
+        self.assertEqual(self.client.get(RECIPE_URL).data, [])
+
+    def test_relation_change_invalidates(self):
+        """Test adding a tag to a recipe refreshes the recipe list"""
+        self.client.get(RECIPE_URL)
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        self.client.get(RECIPE_URL)
+        self.recipe.tags.add(tag)
+
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['tags'], [tag.id])
+
+    def test_cache_is_per_user(self):
+        """Test users never see each other's cached lists"""
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user('other@test.com', 'pass')
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.client.get(RECIPE_URL).data, [])
+
+    @override_settings(RESPONSE_CACHE={'ENABLED': False})
+    def test_disabled(self):
+        """Test the cache can be switched off"""
+        self.client.get(RECIPE_URL)
+        with self.assertNumQueries(4):
+            self.client.get(TAGS_URL)
+            self.client.get(TAGS_URL)
@@ -0,0 +1,92 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, title):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=5
+    )
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes by title, tag and ingredient names"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'search@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.curry = sample_recipe(self.user, 'Thai vegetable curry')
+        self.salad = sample_recipe(self.user, 'Summer salad')
+        self.stew = sample_recipe(self.user, 'Beef stew')
+        self.salad.tags.add(Tag.objects.create(user=self.user, name='Curry'))
+        self.stew.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Carrots')
+        )
+
+    def search(self, text, **params):
+        """Return the titles of the recipes matching a search"""
+        response = self.client.get(RECIPE_URL, {'search': text, **params})
+        results = response.data
+        if isinstance(results, dict):
+            results = results['results']
+        return [recipe['title'] for recipe in results]
+
+    def test_search_title(self):
+        """Test searching recipe titles"""
+        self.assertEqual(self.search('salad'), ['Summer salad'])
+
+    def test_search_tags_and_ingredients(self):
+        """Test tag and ingredient names are searched, title hits first"""
+        self.assertEqual(
+            self.search('curry'), ['Thai vegetable curry', 'Summer salad']
+        )
+        self.assertEqual(self.search('carrots'), ['Beef stew'])
+
+    def test_every_word_must_match(self):
+        """Test multi word searches narrow the results"""
+        self.assertEqual(self.search('thai curry'), ['Thai vegetable curry'])
+        self.assertEqual(self.search('thai stew'), [])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are never returned"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        sample_recipe(other, 'Summer salad deluxe')
+
+        self.assertEqual(self.search('salad'), ['Summer salad'])
+
+    def test_search_paginates_by_rank(self):
+        """Test ranked results can be paged through with cursors"""
+        first = self.client.get(
+            RECIPE_URL, {'search': 'curry', 'page_size': 1}
+        ).data
+        second = self.client.get(first['next']).data
+
+        self.assertEqual(
+            [r['title'] for r in first['results'] + second['results']],
+            ['Thai vegetable curry', 'Summer salad']
+        )
+        self.assertIsNone(second['next'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_vector_follows_renames(self):
+        """Test renaming a tag reindexes the recipes using it"""
+        tag = self.salad.tags.get()
+        tag.name = 'Fresh'
+        tag.save()
+
+        self.assertEqual(self.search('fresh'), ['Summer salad'])
+        self.assertEqual(self.search('curry'), ['Thai vegetable curry'])
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(RESPONSE_CACHE={'ENABLED': False})
+class SparseFieldsTests(TestCase):
+    """Test ``?fields=`` and ``?expand=`` on recipe responses"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'sparse@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Salt'
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5, price=5,
+            link='https://example.com'
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def _get(self, url, params):
+        """Return the response and the SQL of a request"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        return response, [q['sql'] for q in ctx.captured_queries]
+
+    def test_fields_trim_response_and_sql(self):
+        """Test only the requested fields are rendered and loaded"""
+        response, queries = self._get(RECIPE_URL, {'fields': 'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.recipe.id, 'title': 'Soup'}
+        ])
+        recipe_sql = [sql for sql in queries
+                      if sql.startswith('SELECT "core_recipe"."id"')]
+        self.assertEqual(len(recipe_sql), 1)
+        self.assertNotIn('"link"', recipe_sql[0])
+        self.assertFalse(any('core_recipe_tags' in sql for sql in queries))
+
+    def test_fields_keep_needed_relations(self):
+        """Test listed relations are still prefetched as ids"""
+        response, queries = self._get(
+            RECIPE_URL, {'fields': 'tags,images'}
+        )
+
+        self.assertEqual(response.data, [
+            {'id': self.recipe.id, 'tags': [self.tag.id], 'images': None}
+        ])
+        self.assertFalse(
+            any('core_recipe_ingredients' in sql for sql in queries)
+        )
+
+    def test_unknown_fields_rejected(self):
+        """Test misspelled fields are reported"""
+        response = self.client.get(RECIPE_URL, {'fields': 'title,tittle'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(RECIPE_URL, {'expand': 'link'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expand_nests_objects(self):
+        """Test expanded relations are rendered with their names"""
+        response = self.client.get(RECIPE_URL, {'expand': 'tags'})
+
+        self.assertEqual(response.data[0]['tags'], [
+            {'id': self.tag.id, 'name': 'Vegan'}
+        ])
+        self.assertEqual(response.data[0]['ingredients'],
+                         [self.ingredient.id])
+
+    def test_expand_queries_constant(self):
+        """Test expansion is prefetched for the whole page at once"""
+        def count():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(RECIPE_URL, {'expand': 'tags,ingredients'})
+            return len(ctx.captured_queries)
+
+        before = count()
+        for i in range(10):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'R{i}', time_minutes=5, price=5
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f't{i}'))
+
+        self.assertEqual(count(), before)
+
+    def test_retrieve_fields(self):
+        """Test the detail view honours the sparse fieldset"""
+        response = self.client.get(
+            detail_url(self.recipe.id), {'fields': 'title,ingredients'}
+        )
+
+        self.assertEqual(response.data, {
+            'id': self.recipe.id,
+            'title': 'Soup',
+            'ingredients': [{'id': self.ingredient.id, 'name': 'Salt'}],
+        })
+
+    @override_settings(FAST_LIST={'ENABLED': True})
+    def test_sparse_lists_bypass_fast_path(self):
+        """Test fields still apply with the fast list path enabled"""
+        response = self.client.get(RECIPE_URL, {'fields': 'price'})
+
+        self.assertEqual(response.data, [
+            {'id': self.recipe.id, 'price': '5.00'}
+        ])
@@ -0,0 +1,177 @@
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Change, Ingredient, Recipe, Tag
+
+CHANGES_URL = reverse('recipe:changes')
+
+
+def sample_recipe(user, title='Soup'):
+    """Create and return a sample recipe"""
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=5, price=5
+    )
+
+
+@override_settings(DELTA_SYNC={'SETTLE_SECONDS': 0})
+class DeltaSyncTests(TestCase):
+    """Test the delta sync change feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'sync@test.com',
+            'testpass'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def sync(self, token=None, **params):
+        """Request the changes since a token and return the payload"""
+        if token is not None:
+            params['since'] = token
+        response = self.client.get(CHANGES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_login_required(self):
+        """Test the feed requires authentication"""
+        response = APIClient().get(CHANGES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_snapshot_without_token(self):
+        """Test the first sync returns every object of the user only"""
+        sample_recipe(get_user_model().objects.create_user('o@test.com', 'p'))
+        data = self.sync()
+
+        self.assertEqual([r['id'] for r in data['recipes']], [self.recipe.id])
+        self.assertEqual([t['name'] for t in data['tags']], ['Vegan'])
+        self.assertEqual(data['ingredients'], [])
+        self.assertFalse(data['has_more'])
+        self.assertTrue(data['sync_token'])
+
+    def test_changes_since_token(self):
+        """Test only changed objects and tombstones are returned"""
+        untouched = sample_recipe(self.user, 'Untouched')
+        token = self.sync()['sync_token']
+        self.recipe.title = 'Stew'
+        self.recipe.save()
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        tag_id = self.tag.id
+        self.tag.delete()
+
+        data = self.sync(token)
+        self.assertEqual([r['title'] for r in data['recipes']], ['Stew'])
+        self.assertEqual([i['id'] for i in data['ingredients']],
+                         [ingredient.id])
+        self.assertEqual(data['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+        self.assertNotIn(
+            untouched.id, [r['id'] for r in data['recipes']]
+        )
+
+        data = self.sync(data['sync_token'])
+        self.assertEqual(data['recipes'], [])
+        self.assertEqual(data['deleted']['tags'], [])
+
+    def test_relation_changes_are_logged(self):
+        """Test linking or deleting a tag reports the affected recipe"""
+        token = self.sync()['sync_token']
+        self.recipe.tags.add(self.tag)
+        data = self.sync(token)
+        self.assertEqual(data['recipes'][0]['tags'], [self.tag.id])
+
+        token = data['sync_token']
+        tag_id = self.tag.id
+        self.tag.delete()
+        data = self.sync(token)
+        self.assertEqual(data['recipes'][0]['tags'], [])
+        self.assertEqual(data['deleted']['tags'], [tag_id])
+
+    def test_log_keeps_latest_entry_per_object(self):
+        """Test repeated edits do not grow the change log"""
+        for title in ('One', 'Two', 'Three'):
+            self.recipe.title = title
+            self.recipe.save()
+
+        self.assertEqual(
+            Change.objects.filter(model='recipe').count(), 1
+        )
+
+    def test_paging(self):
+        """Test large change sets are returned in pages"""
+        token = self.sync()['sync_token']
+        for i in range(3):
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+
+        first = self.sync(token, limit=2)
+        second = self.sync(first['sync_token'], limit=2)
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(len(first['tags']) + len(second['tags']), 3)
+
+    def test_invalid_tokens(self):
+        """Test forged tokens and tokens of other users are rejected"""
+        other = get_user_model().objects.create_user('o@test.com', 'pass')
+        self.client.force_authenticate(other)
+        foreign = self.sync()['sync_token']
+        self.client.force_authenticate(self.user)
+
+        for token in ('garbage', foreign):
+            response = self.client.get(CHANGES_URL, {'since': token})
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    @override_settings(DELTA_SYNC={'SETTLE_SECONDS': 60})
+    def test_recent_entries_are_resent(self):
+        """Test tokens do not move past entries that may still settle"""
+        token = self.sync()['sync_token']
+        Tag.objects.create(user=self.user, name='Fresh')
+
+        first = self.sync(token)
+        second = self.sync(first['sync_token'])
+        self.assertEqual(first['sync_token'], token)
+        self.assertIn('Fresh', [t['name'] for t in second['tags']])
+
+    def test_entries_ordered_by_transaction(self):
+        """Test entries of a later transaction are sent after a lower id"""
+        token = self.sync()['sync_token']
+        tag = Tag.objects.create(user=self.user, name='Late')
+        Change.objects.filter(object_id=tag.id, model='tag').update(txid=2)
+        Change.objects.filter(object_id=self.tag.id, model='tag').update(
+            txid=1
+        )
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+        Change.objects.filter(object_id=self.tag.id, model='tag').update(
+            txid=1
+        )
+
+        first = self.sync(token, limit=1)
+        second = self.sync(first['sync_token'], limit=1)
+        self.assertEqual([t['name'] for t in first['tags']], ['Vegetarian'])
+        self.assertEqual([t['name'] for t in second['tags']], ['Late'])
+
+    def test_legacy_token(self):
+        """Test tokens holding a bare entry id are still accepted"""
+        cursor = Change.objects.order_by('-id').first().id
+        token = signing.dumps({'u': self.user.id, 'c': cursor},
+                              salt='recipe.sync')
+        Tag.objects.create(user=self.user, name='Fresh')
+
+        data = self.sync(token)
+        self.assertEqual([t['name'] for t in data['tags']], ['Fresh'])
+
+    def test_deleting_user_purges_log(self):
+        """Test a deleted user's change log is removed with it"""
+        self.user.delete()
+
+        self.assertFalse(Change.objects.exists())
@@ -9,5 +9,11 @@ app_name = 'recipe'
 router.register('ingredients',views.IngredientViewset)
 router.register('recipes',views.RecipeViewSet)
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path(
+        'images/<path:name>/<str:variant>.<str:ext>',
+        views.image_variant,
+        name='image-variant'
+    ),
 ]
@@ -1,94 +1,281 @@
+from django.core import signing
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import viewsets,mixins,status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 # Create your views here.
-from core.models import Tag,Ingredient,Recipe
+from core import media
+from core.models import Ingredient, Recipe, Tag, recipe_image_name
 
-from . import serializers
+from . import autocomplete, images, serializers, sync, tasks
+from .bulk import BulkMixin
+from .cache import CachedListMixin
+from .conditional import ConditionalListMixin, ConditionalRetrieveMixin, \
+    collection_state
+from .export import FORMATS as EXPORT_FORMATS, export_stream
+from .fastpath import FastListMixin, decimal_formatter
+from .pagination import KeysetPagination
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+
+class BaseRecipeAttrViewSet(BulkMixin,
+                            CachedListMixin,
+                            ConditionalListMixin,
+                            FastListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+    ordering = ('-name', '-id')
+    fast_list_columns = ('id', 'name')
+    # Per action ceilings held at any data size by recipe/tests/test_budgets
+    performance_budgets = {
+        'list': {'queries': 3, 'ms': 250},
+        'create': {'queries': 4, 'ms': 250},
+        'bulk': {'queries': 14, 'ms': 500},
+        'autocomplete': {'queries': 1, 'ms': 100},
+    }
+
+    def _assigned_only(self):
+        """Return whether only objects used by a recipe are requested"""
+        return bool(int(self.request.query_params.get('assigned_only', 0)))
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        if self._assigned_only():
+            queryset = queryset.filter(recipe__isnull=False).distinct()
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by(*self.ordering)
+
+    def get_list_state(self, queryset):
+        """Include the user's recipes, whose links decide what is assigned"""
+        state = super().get_list_state(queryset)
+        if self._assigned_only():
+            state += collection_state(
+                Recipe.objects.filter(user=self.request.user)
+            )
+        return state
 
     def perform_create(self, serializer):
         """Create a new object"""
         serializer.save(user=self.request.user)
 
+    def check_bulk_items(self, validated, errors, instances):
+        """Reject names repeated in the batch or taken by other objects"""
+        positions = {}
+        for index, item in enumerate(validated):
+            if item and 'name' in item:
+                positions.setdefault(item['name'].lower(), []).append(index)
+        if not positions:
+            return
+        owners = dict(self.queryset.filter(
+            user=self.request.user
+        ).annotate(lower_name=Lower('name')).filter(
+            lower_name__in=positions
+        ).values_list('lower_name', 'pk'))
+        for lower_name, indexes in positions.items():
+            owner = owners.get(lower_name)
+            for index in indexes:
+                if len(indexes) > 1:
+                    errors[index]['name'] = ['Duplicate name.']
+                elif owner is not None and \
+                        owner != validated[index].get('id'):
+                    errors[index]['name'] = ['This name is already used.']
+
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """Return the most used objects with a word starting with ``q``"""
+        try:
+            limit = int(request.query_params.get('limit', ''))
+        except ValueError:
+            limit = autocomplete.get_option('LIMIT')
+        limit = max(1, min(limit, autocomplete.get_option('MAX_LIMIT')))
+        index = autocomplete.get_index(self.queryset, request.user.pk)
+        matches = index.search(request.query_params.get('q', ''), limit)
+        return Response([
+            {'id': pk, 'name': name, 'uses': uses}
+            for pk, name, uses in matches
+        ])
 
-class TagViewSet(viewsets.GenericViewSet,mixins.ListModelMixin,mixins.CreateModelMixin):
+
+class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
-    authentication_classes = TokenAuthentication,
-    permission_classes = IsAuthenticated,
     queryset = Tag.objects.all()
     serializer_class = serializers.SerializerTag
+    bulk_serializer_class = serializers.TagBulkSerializer
 
-    def get_queryset(self):
-        """Return objects for the current aUthenticated users only!"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
 
-    def perform_create(self, serializer):
-        """Create a new tag"""
-        serializer.save(user=self.request.user)
-
-class IngredientViewset(viewsets.GenericViewSet,mixins.ListModelMixin,mixins.CreateModelMixin):
+class IngredientViewset(BaseRecipeAttrViewSet):
     """Manage ingredient in the database"""
-    authentication_classes = TokenAuthentication,
-    permission_classes = IsAuthenticated,
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    bulk_serializer_class = serializers.IngredientBulkSerializer
 
-    def get_queryset(self):
-        """Return objects for the current authenticated users"""
-        return self.queryset.filter(user=self.request.user).order_by('-name')
-
-    def perform_create(self, serializer):
-        """Create a new ingredient"""
-        serializer.save(user=self.request.user)
 
-
-
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(BulkMixin,
+                    CachedListMixin,
+                    ConditionalListMixin,
+                    ConditionalRetrieveMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = TokenAuthentication,
     permission_classes = IsAuthenticated,
-    def _params_to_int(self,qs):
-
-        return [int(str_id) for str_id in qs.split(',')]
+    pagination_class = KeysetPagination
+    ordering = ('-id',)
+    conditional_relations = ('tags', 'ingredients')
+    bulk_serializer_class = serializers.RecipeBulkSerializer
+    bulk_relations = ('tags', 'ingredients')
+    fast_list_columns = ('id', 'title', 'time_minutes', 'price', 'link',
+                         'image', 'image_status')
+    fast_list_relations = ('tags', 'ingredients')
+    format_price = staticmethod(
+        decimal_formatter(Recipe._meta.get_field('price'))
+    )
+    image_storage = Recipe._meta.get_field('image').storage
+    # Serializer fields rendered from differently named model fields
+    field_sources = {'images': ('image', 'image_status')}
+    expandable_relations = ('tags', 'ingredients')
+    # Per action ceilings held at any data size by recipe/tests/test_budgets
+    performance_budgets = {
+        'list': {'queries': 4, 'ms': 250},
+        'retrieve': {'queries': 4, 'ms': 250},
+        'create': {'queries': 11, 'ms': 500},
+        'update': {'queries': 17, 'ms': 500},
+        'partial_update': {'queries': 11, 'ms': 500},
+        'destroy': {'queries': 6, 'ms': 250},
+        'bulk': {'queries': 14, 'ms': 1000},
+        'export': {'queries': 3, 'ms': 500},
+        'upload_image': {'queries': 18, 'ms': 1000},
+    }
+    action_querysets = {
+        'list': 'for_list',
+        'retrieve': 'for_detail',
+        'update': 'for_list',
+        'partial_update': 'for_list',
+        'upload_image': 'for_image',
+        'bulk': 'for_list',
+    }
 
+    def _params_to_int(self,qs):
+        """Convert a comma separated list of ids to integers"""
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError(
+                {'detail': f'Expected a comma separated list of ids: {qs}'}
+            )
 
     def get_queryset(self):
         """Retrieve the recipe for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        match_all = self.request.query_params.get('match', 'any') == 'all'
+        queryset = self.queryset.filter(user=self.request.user)
         if tags:
-            tags_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_int(tags)
+            queryset = queryset.filter_related('tags', tag_ids, match_all)
         if ingredients:
-            ingredients_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(tags__id__in=ingredients_ids)
-        return self.queryset.filter(user = self.request.user)
+            ingredient_ids = self._params_to_int(ingredients)
+            queryset = queryset.filter_related(
+                'ingredients', ingredient_ids, match_all
+            )
+        if self._search_text():
+            queryset = queryset.search(self._search_text())
+        return self._queryset_for_action(queryset).order_by(
+            *self.get_ordering()
+        )
+
+    def _search_text(self):
+        """Return the stripped search parameter of a list request"""
+        if self.action != 'list':
+            return ''
+        return self.request.query_params.get('search', '').strip()
+
+    def get_ordering(self):
+        """Order search results by relevance, everything else by id"""
+        if self._search_text():
+            return ('-search_rank', '-id')
+        return self.ordering
+
+    def _name_list_param(self, name, allowed):
+        """Return the checked names of a comma separated read parameter"""
+        value = self.request.query_params.get(name)
+        if value is None or self.action not in ('list', 'retrieve'):
+            return None
+        names = [item.strip() for item in value.split(',') if item.strip()]
+        unknown = sorted(set(names) - set(allowed))
+        if unknown:
+            raise ValidationError(
+                {name: f'Unknown fields: {", ".join(unknown)}'}
+            )
+        return names
+
+    def _requested_fields(self):
+        """Return the response fields named in ``fields``, or None for all"""
+        names = self._name_list_param(
+            'fields', serializers.RecipeSerializer.Meta.fields
+        )
+        if names is None:
+            return None
+        return ['id'] + [name for name in names if name != 'id']
+
+    def _expanded(self):
+        """Return the relations to nest as objects in a list response"""
+        if self.action != 'list':
+            return ()
+        return tuple(
+            self._name_list_param('expand', self.expandable_relations) or ()
+        )
+
+    def get_list_relations(self):
+        """Cover renames of the expanded tags and ingredients in the ETag"""
+        return self._expanded()
+
+    def _loader_options(self):
+        """Return the sparse fieldset options of the read loaders"""
+        fields = self._requested_fields()
+        if fields is not None:
+            fields = [source for name in fields
+                      for source in self.field_sources.get(name, (name,))]
+        if self.action == 'list':
+            return {'fields': fields, 'expand': self._expanded()}
+        if self.action == 'retrieve':
+            return {'fields': fields}
+        return {}
+
+    def _queryset_for_action(self, queryset):
+        """Load only the columns and relations the current action renders"""
+        loader = self.action_querysets.get(self.action)
+        if loader is None:
+            return queryset
+        return getattr(queryset, loader)(**self._loader_options())
+
+    def get_serializer_context(self):
+        """Pass the sparse fieldset and expansions to the serializer"""
+        context = super().get_serializer_context()
+        fields = self._requested_fields()
+        if fields is not None:
+            context['fields'] = fields
+        if self._expanded():
+            context['expand'] = self._expanded()
+        return context
+
+    def use_fast_list(self):
+        """Leave sparse and expanded lists to the serializer"""
+        return super().use_fast_list() and \
+            self._requested_fields() is None and not self._expanded()
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -98,27 +285,152 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeImageSerializer
         return self.serializer_class
 
+    def fast_list_row(self, row):
+        """Render a values() row exactly like ``RecipeSerializer``"""
+        image = row['image']
+        ready = image and row['image_status'] == Recipe.IMAGE_READY
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'ingredients': row['ingredients'],
+            'tags': row['tags'],
+            'time_minutes': row['time_minutes'],
+            'price': self.format_price(row['price']),
+            'link': row['link'],
+            'image_status': row['image_status'],
+            'images': images.stored_image_urls(
+                self.image_storage, image, self.request
+            ) if ready else None,
+        }
+
     def perform_create(self, serializer):
         """ Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """Stream the user's whole library as NDJSON or CSV (``?type=``)"""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'type': f'Expected one of: {", ".join(EXPORT_FORMATS)}'}
+            )
+        content_type, extension = EXPORT_FORMATS[export_type]
+        response = StreamingHttpResponse(
+            export_stream(request.user.pk, export_type),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{extension}"'
+        return response
 
     @action(methods=['POST'],detail=True,url_path='upload_image')
     def upload_image(self,request,pk=None):
-        """Upload an image to a recipe"""
+        """Accept an image upload and queue it for processing"""
         recipe = self.get_object()
+        previous = recipe.image.name
         serializer = self.get_serializer(
             recipe,
             data=request.data
         )
         if serializer.is_valid():
-            serializer.save()
+            upload = serializer.validated_data.get('image')
+            name = upload and recipe_image_name(upload, upload.name)
+            # Keep a concurrent release of the same file from deleting it
+            with images.image_lock(name):
+                serializer.save(image_status=Recipe.IMAGE_PENDING)
+            storage = recipe.image.storage
+            transaction.on_commit(
+                lambda: images.release_image(storage, previous)
+            )
+            tasks.enqueue_image(recipe.id)
             return Response(
                 serializer.data,
-                status=status.HTTP_200_OK
+                status=status.HTTP_202_ACCEPTED
 
             )
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+
+class ChangesView(APIView):
+    """Return the user's objects changed since a sync token.
+
+    Without ``since`` the response is a full snapshot. Either way it
+    carries a new ``sync_token``; clients keep requesting with it while
+    ``has_more`` is true. Objects are sent in their list representation
+    and deletions as ids under ``deleted``.
+    """
+    permission_classes = (IsAuthenticated,)
+    performance_budgets = {'get': {'queries': 6, 'ms': 500}}
+    # log label -> (response key, queryset, serializer)
+    sync_models = {
+        'recipe': ('recipes', Recipe.objects.for_list(),
+                   serializers.RecipeSerializer),
+        'tag': ('tags', Tag.objects.all(), serializers.SerializerTag),
+        'ingredient': ('ingredients', Ingredient.objects.all(),
+                       serializers.IngredientSerializer),
+    }
+
+    def get_limit(self):
+        """Return the requested number of log entries per response"""
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return sync.get_option('PAGE_SIZE')
+        return max(1, min(limit, sync.get_option('MAX_PAGE_SIZE')))
+
+    def get(self, request):
+        user_id = request.user.pk
+        token = request.query_params.get('since')
+        if token is None:
+            cursor = sync.current_cursor(user_id)
+            return self._respond(cursor, False, None, {})
+
+        try:
+            cursor = sync.read_token(token, user_id)
+        except signing.BadSignature:
+            raise ValidationError({'since': 'Invalid sync token'})
+        entries, cursor, has_more = sync.read_changes(
+            user_id, cursor, self.get_limit()
+        )
+        latest = {(entry.model, entry.object_id): entry for entry in entries}
+        upserted, deleted = {}, {}
+        for (label, object_id), entry in latest.items():
+            target = deleted if entry.deleted else upserted
+            target.setdefault(label, []).append(object_id)
+        return self._respond(cursor, has_more, upserted, deleted)
+
+    def _respond(self, cursor, has_more, upserted, deleted):
+        """Serialize the changed objects, or all of them if upserted is None"""
+        data = {
+            'sync_token': sync.make_token(self.request.user.pk, cursor),
+            'has_more': has_more,
+        }
+        context = {'request': self.request}
+        for label, (key, queryset, serializer) in self.sync_models.items():
+            queryset = queryset.filter(user=self.request.user).order_by('id')
+            if upserted is not None:
+                ids = upserted.get(label)
+                queryset = queryset.filter(pk__in=ids) if ids else []
+            data[key] = serializer(queryset, many=True, context=context).data
+        data['deleted'] = {
+            key: sorted(deleted.get(label, []))
+            for label, (key, _, _) in self.sync_models.items()
+        }
+        return Response(data)
+
+
+def image_variant(request, name, variant, ext):
+    """Serve a resized recipe image, generating it on first request"""
+    if variant not in images.VARIANTS or ext not in images.enabled_formats():
+        raise Http404
+    if not Recipe.objects.filter(
+        image=name, image_status=Recipe.IMAGE_READY
+    ).exists():
+        raise Http404
+    storage = Recipe._meta.get_field('image').storage
+    path = images.ensure_variant(storage, name, variant, ext)
+    return media.serve_file(request, storage.path(path), path)
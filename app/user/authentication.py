@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULTS = {
+    'SIZE': 10000,
+    'TTL': 60,
+    'SHARED_CACHE': None,
+}
+
+
+class TokenCache:
+    """Bounded LRU mapping token keys to users, with an optional shared tier.
+
+    Users are stored as ``(field names, values)`` rows and rebuilt with
+    ``Model.from_db`` on every hit, so requests never share a mutable
+    instance. The shared tier is any configured Django cache alias and is
+    keyed by a hash of the token so raw keys never leave the process.
+    Fields in ``skipped_fields`` are never cached; rebuilt users load them
+    from the database on first access.
+    """
+    skipped_fields = ('password',)
+
+    def __init__(self, size, ttl, shared_alias=None):
+        self.size = size
+        self.ttl = ttl
+        self.shared = caches[shared_alias] if shared_alias else None
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shared_key(key):
+        """Return the shared cache key for a token"""
+        return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached user for a token or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return self._build(entry[1])
+                self._discard(key)
+
+        if self.shared is None:
+            return None
+        row = self.shared.get(self.shared_key(key))
+        if row is None:
+            return None
+        self._store(key, row)
+        return self._build(row)
+
+    def set(self, key, user):
+        """Cache the user authenticated by a token"""
+        names = [field.attname for field in user._meta.concrete_fields
+                 if field.attname not in self.skipped_fields]
+        row = (names, [getattr(user, name) for name in names])
+        self._store(key, row)
+        if self.shared is not None:
+            self.shared.set(self.shared_key(key), row, self.ttl)
+
+    def invalidate(self, key):
+        """Drop a single token from every tier"""
+        with self._lock:
+            self._discard(key)
+        if self.shared is not None:
+            self.shared.delete(self.shared_key(key))
+
+    def invalidate_user(self, user_id, keys=()):
+        """Drop every cached token of a user"""
+        with self._lock:
+            keys = set(keys) | self._keys_by_user.get(user_id, set())
+            for key in keys:
+                self._discard(key)
+        if self.shared is not None and keys:
+            self.shared.delete_many([self.shared_key(key) for key in keys])
+
+    def clear(self):
+        """Empty the in-process tier"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key, row):
+        """Insert a row into the LRU, evicting the oldest entries"""
+        user_id = row[1][row[0].index(get_user_model()._meta.pk.attname)]
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, row, user_id)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.size:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        """Remove a key from the LRU; the lock must be held"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[2]]
+
+    @staticmethod
+    def _build(row):
+        """Rebuild a fresh user instance from a cached row"""
+        names, values = row
+        return get_user_model().from_db('default', names, values)
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """Return the process wide token cache configured in settings"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                options = {
+                    **DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})
+                }
+                _token_cache = TokenCache(
+                    options['SIZE'], options['TTL'], options['SHARED_CACHE']
+                )
+    return _token_cache
+
+
+def reset_token_cache():
+    """Forget the configured cache so it is rebuilt from settings"""
+    global _token_cache
+    with _token_cache_lock:
+        _token_cache = None
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that skips the token/user query on cache hits"""
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        user = cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, user)
+            return user, token
+
+        token = self.get_model()(key=key, user=user)
+        token._state.adding = False
+        return user, token
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import get_token_cache, reset_token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a token as soon as it is deleted"""
+    get_token_cache().invalidate(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """Drop cached users whose state (is_active, password...) changed"""
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    get_token_cache().invalidate_user(instance.pk, keys)
+
+
+@receiver(setting_changed)
+def reload_token_cache(setting, **kwargs):
+    """Rebuild the cache when TOKEN_AUTH_CACHE is overridden"""
+    if setting in ('TOKEN_AUTH_CACHE', 'CACHES'):
+        reset_token_cache()
@@ -0,0 +1,137 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, get_token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication class"""
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            email='cache@test.com',
+            password='testpass',
+            name='Cached'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        get_token_cache().clear()
+
+    def test_second_request_skips_token_query(self):
+        """Test a cached token authenticates without touching the db"""
+        self.client.get(ME_URL)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_deleted_token_rejected(self):
+        """Test deleting a token invalidates the cached entry"""
+        self.client.get(ME_URL)
+        self.token.delete()
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user invalidates their cached tokens"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """Test changing the password drops the cached user"""
+        self.client.get(ME_URL)
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        self.assertIsNone(get_token_cache().get(self.token.key))
+
+    def test_cached_users_are_not_shared(self):
+        """Test every hit rebuilds a separate user instance"""
+        cache = get_token_cache()
+        cache.set(self.token.key, self.user)
+
+        first = cache.get(self.token.key)
+        first.name = 'Changed'
+        self.assertEqual(cache.get(self.token.key).name, 'Cached')
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'tokens': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'token-tests',
+        },
+    }, TOKEN_AUTH_CACHE={'SIZE': 10, 'TTL': 60, 'SHARED_CACHE': 'tokens'})
+    def test_shared_tier_fills_local_tier(self):
+        """Test a user cached by another process is found in the shared tier"""
+        get_token_cache().set(self.token.key, self.user)
+        get_token_cache().clear()
+
+        user = get_token_cache().get(self.token.key)
+        self.assertEqual(user.pk, self.user.pk)
+        get_token_cache().invalidate(self.token.key)
+        get_token_cache().clear()
+        self.assertIsNone(get_token_cache().get(self.token.key))
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded token LRU"""
+
+    def setUp(self):
+        self.users = [
+            get_user_model().objects.create_user(f'lru{i}@test.com', 'pass')
+            for i in range(3)
+        ]
+
+    def test_least_recently_used_evicted(self):
+        """Test the oldest entry is dropped when the cache is full"""
+        cache = TokenCache(size=2, ttl=60)
+        cache.set('a', self.users[0])
+        cache.set('b', self.users[1])
+        cache.get('a')
+        cache.set('c', self.users[2])
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+    def test_password_hash_not_cached(self):
+        """Test the hash stays out of the cache and loads on demand"""
+        cache = TokenCache(size=2, ttl=60)
+        cache.set('a', self.users[0])
+        user = cache.get('a')
+
+        self.assertNotIn('password', cache._entries['a'][1][0])
+        self.assertEqual(user.get_deferred_fields(), {'password'})
+        self.assertTrue(user.check_password('pass'))
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their TTL"""
+        cache = TokenCache(size=2, ttl=10)
+        with patch('user.authentication.time.monotonic', return_value=100):
+            cache.set('a', self.users[0])
+        with patch('user.authentication.time.monotonic', return_value=111):
+            self.assertIsNone(cache.get('a'))
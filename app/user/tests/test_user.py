@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.testing import BudgetTestMixin
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 ME_URL = reverse('user:me')
@@ -129,3 +131,29 @@ class PrivateUserAPITests(TestCase):
     #     self.assertTrue(self.user.check_password(payload['password']))
     #     self.assertEqual(response.status_code,status.HTTP_200_OK)
 
+
+class UserBudgetTests(BudgetTestMixin, TestCase):
+    """Test the user endpoints stay within their declared budgets"""
+
+    def setUp(self):
+        self.user = create_user(email='budget@test.com', password='testpass')
+        self.client = APIClient()
+
+    def test_create_and_token(self):
+        """Test signing up and obtaining a token"""
+        self.assertWithinBudget('post', CREATE_USER_URL, data={
+            'email': 'new@test.com', 'password': 'testpass', 'name': 'New'
+        })
+        self.assertWithinBudget('post', TOKEN_URL, data={
+            'email': 'budget@test.com', 'password': 'testpass'
+        })
+
+    def test_manage_profile(self):
+        """Test reading and updating the profile"""
+        self.client.force_authenticate(user=self.user)
+        self.assertWithinBudget('get', ME_URL)
+        self.assertWithinBudget('patch', ME_URL, data={'name': 'Renamed'})
+        self.assertWithinBudget('put', ME_URL, data={
+            'email': 'budget@test.com', 'password': 'newpass123',
+            'name': 'Renamed'
+        })
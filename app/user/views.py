@@ -1,5 +1,5 @@
 from .serializers import UserSerializer, AuthTokenSerializer
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -7,19 +7,26 @@ from rest_framework.settings import api_settings
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    # Password hashing dominates; its cost is a setting, not a regression
+    performance_budgets = {'post': {'queries': 3}}
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    performance_budgets = {'post': {'queries': 5}}
 
 
 class ManagerUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    performance_budgets = {
+        'get': {'queries': 2, 'ms': 100},
+        'put': {'queries': 5},
+        'patch': {'queries': 3, 'ms': 100},
+    }
 
     def get_object(self):
         """Retrieve and return authenticated user"""